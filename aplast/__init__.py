@@ -1,8 +1,88 @@
-from unicodedata import name
-from .diver import *
-from . import divers
-from . import trajectory
-from . import constants
-from . import formulas
-
-from .variables import *
+import importlib
+
+# Submodules are only imported when they are first used, so that "import aplast"
+# does not load matplotlib, scipy or pandas. Plotting style is set with aplast.set_style()
+submodules = [
+    "background",
+    "constants",
+    "diver",
+    "divers",
+    "formulas",
+    "incremental",
+    "lookup",
+    "memoize",
+    "profiling",
+    "report",
+    "simulation",
+    "trajectory",
+    "uncertainty",
+    "variables",
+]
+
+# Names available at the package level and their submodule
+attributes = {
+    **{
+        name: "diver"
+        for name in [
+            "Diver",
+            "get_volume_tissues",
+            "get_drag_coefficient",
+            "get_forces",
+            "get_work",
+            "get_total_work",
+            "get_net_forces",
+            "get_total_work_batch",
+            "get_total_work_gliding",
+            "get_total_work_integral",
+            "get_total_work_derivatives",
+            "get_best_ballast",
+            "minimize_batch",
+            "WarmStarts",
+            "get_seconds",
+        ]
+    },
+    **{
+        name: "constants"
+        for name in [
+            "g",
+            "r_water",
+            "pressure_0",
+            "r_ballast",
+            "r_neo",
+            "r_nfoam",
+            "w_linen",
+            "get_color",
+            "set_style",
+            "get_file",
+        ]
+    },
+    **{
+        name: "variables"
+        for name in [
+            "Variable",
+            "get_var_slider",
+            "get_var_number",
+            "set_var_on_change_function",
+            "set_var_cookies",
+        ]
+    },
+}
+
+# "from aplast import *" imports everything
+__all__ = submodules + list(attributes)
+
+
+def __getattr__(name):
+    if name in submodules:
+        return importlib.import_module(f".{name}", __name__)
+
+    if name in attributes:
+        value = getattr(importlib.import_module(f".{attributes[name]}", __name__), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + submodules + list(attributes))
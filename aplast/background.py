@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Background:
+    """Computations of a session in a (shared) executor, identified by the key of their inputs
+
+    Submitting a new key cancels the pending computations of the other keys (a running one finishes
+    but its result is dropped), and the last result is kept to be shown while the next one is computed.
+    """
+
+    def __init__(self, executor=None) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=1) if executor is None else executor
+        self.futures = {}
+        self.last_key, self.last_result = None, None
+
+    def submit(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs) unless the computation of the key is already submitted"""
+        for k in [k for k in self.futures if k != key]:
+            self.futures.pop(k).cancel()
+
+        if key not in self.futures:
+            self.futures[key] = self.executor.submit(func, *args, **kwargs)
+        return self.futures[key]
+
+    def done(self, key) -> bool:
+        future = self.futures.get(key)
+        return future is not None and future.done()
+
+    def result(self, key):
+        """Result of the key if it is available, the last result otherwise (None before the first one)"""
+        if self.done(key):
+            self.last_key, self.last_result = key, self.futures[key].result()
+        return self.last_result
+
+    def wait(self, key, timeout=None, poll=0.1, callback=None):
+        """Wait for the computation of the key
+
+        callback : function called at each poll (a Streamlit command lets Streamlit stop the script when the inputs change)
+
+        return the result, None on timeout or if the computation has been replaced
+        """
+        start = time.monotonic()
+        while not self.done(key):
+            if key not in self.futures or (timeout is not None and time.monotonic() - start > timeout):
+                return None
+            time.sleep(poll)
+            if callback is not None:
+                callback()
+
+        return self.result(key)
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
 
@@ -36,6 +35,9 @@ def get_color(discipline):
 
 
 def set_style():
+    """Set the package style of the matplotlib figures"""
+    import matplotlib.pyplot as plt
+
     plt.rcParams["axes.grid"] = True
     plt.rcParams["axes.edgecolor"] = get_color("axis")
     plt.rcParams["axes.labelcolor"] = get_color("axis")
@@ -65,10 +67,16 @@ def set_style():
     )
 
 
-set_style()
+# Paths found by get_file, by working directory and filename
+files = {}
 
 
 def get_file(filename):
-    for d in [".", "aplast/notebooks", "../aplast/notebooks", "aplast/aplast", "../aplast/aplast", "../aplast"]:
-        if os.path.exists(f"{d}/{filename}"):
-            return f"{d}/{filename}"
+    """Path of a data file, searched once in the usual directories and in the package directory"""
+    key = (os.getcwd(), filename)
+    if key not in files:
+        directories = [".", "aplast/notebooks", "../aplast/notebooks", "aplast/aplast", "../aplast/aplast", "../aplast"]
+        directories.append(os.path.dirname(os.path.abspath(__file__)))
+        files[key] = next((f"{d}/{filename}" for d in directories if os.path.exists(f"{d}/{filename}")), None)
+
+    return files[key]
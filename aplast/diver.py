@@ -1,11 +1,61 @@
-import pandas as pd
+import time
+import logging
+from collections import Counter
+
 import numpy as np
 import uncertainties as unc
-from scipy.optimize import minimize
+from uncertainties import unumpy
 
 from .constants import *
+from .memoize import LRUCache, get_key
+from .profiling import instrument, timer
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most rate records of each kind (flag extra attribute or message) through every period seconds"""
+
+    def __init__(self, rate=10, period=60.0) -> None:
+        super().__init__()
+        self.rate, self.period = rate, period
+        self.windows = {}
+        self.suppressed = Counter()
+
+    def filter(self, record) -> bool:
+        key = getattr(record, "flag", record.msg)
+        now = time.monotonic()
+        start, count = self.windows.get(key, (now, 0))
+        if now - start >= self.period:
+            start, count = now, 0
+
+        self.windows[key] = (start, count + 1)
+        if count < self.rate:
+            return True
 
+        self.suppressed[key] += 1
+        return False
 
+
+logger = logging.getLogger(__name__)
+rate_limit = RateLimitFilter()
+logger.addFilter(rate_limit)
+
+# Number of non physical configurations met by get_total_work and get_total_work_batch(diagnostics=True)
+flag_counts = Counter()
+
+# Condition checked by each flag
+flag_messages = {
+    "force_weight": "force_weight should be > 0",
+    "force_archimede1": "force_archimede1 should be > 0",
+    "force_archimede2": "force_archimede2 should be > 0",
+    "force_drag_descent": "force_drag_descent should be > 0",
+    "force_drag_ascent": "force_drag_ascent should be > 0",
+    # The diver is not going deep enough to get out the gliding zone, the sign of the force is flipped
+    "force_descent": "force_descent should be < 0",
+    "force_ascent": "force_ascent should be > 0",
+}
+
+
+@instrument
 def get_volume_tissues(
     mass_body,
     mass_ballast,
@@ -64,6 +114,7 @@ def get_volume_tissues(
     return Vt
 
 
+@instrument
 def get_drag_coefficient(
     volume_suit, volume_gas, speed_d, speed_a, depth_eq_d, depth_eq_a
 ):
@@ -97,9 +148,7 @@ def get_drag_coefficient(
     )
 
 
-def get_total_work(
-    surname,
-    depth_max,
+def get_forces(
     mass_body,
     mass_ballast,
     volume_incompress,
@@ -109,17 +158,10 @@ def get_total_work(
     speed_ascent,
     drag_coefficient,
 ):
-    """Calculation of the mechanical work spent for the descent
+    """Calculation of the forces applied on the diver at the surface
 
-    depth_max   = depth_max
-    mass_body    = mass of the body
-    mass_ballast : mass of the ballast
-    volume_incompress   = get_volume_tissues(mass_body, mass_ballast, volume_suit, volume_gas, speed_descent, speed_a, depth_eq_d, depth_eq_a) : volume of the incompressible (liquid and solid part) part of the body
-    volume_suit   = volume of the suit
-    volume_gas   = volume_lungs : volume of the compressible (gaseous part)  part of the body at p_0 pressure
-    speed_d   = descent speed
-    speed_a   = ascension speed
-    drag_coefficient : hydrodynamic drag constant
+    return force_weight, force_archimede1 (incompressible part), force_archimede2 (compressible part),
+    force_drag_descent, force_drag_ascent
     """
 
     force_weight = g * (mass_body + mass_ballast + r_nfoam * volume_suit)
@@ -138,25 +180,90 @@ def get_total_work(
     force_drag_descent = drag_coefficient * speed_descent**2
     force_drag_ascent = drag_coefficient * speed_ascent**2
 
-    if force_weight <= 0:
-        print(f"{surname} force_weight {force_weight} is negative")
+    return (
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+    )
+
+
+def get_work(depth_max, force_descent, force_ascent, force_archimede2, log=np.log):
+    """Closed-form of the mechanical work from the forces (force_descent < 0 and force_ascent > 0)
+
+    log = logarithm function adapted to the type of the forces
+    """
+
+    pressure_depth_max = pressure_0 + depth_max * g * r_water
 
-    if force_archimede1 <= 0:
-        print(f"{surname} force_archimede1 {force_archimede1} is negative")
+    work_core = force_ascent - force_descent - 2 * force_archimede2
+    work_core += -force_archimede2 * log(pressure_depth_max / pressure_0)
+    work_core += force_archimede2 * log(force_archimede2 / force_ascent)
+    work_core += force_archimede2 * log(-force_archimede2 / force_descent)
 
-    if force_archimede2 <= 0:
-        print(f"{surname} force_archimede2 {force_archimede2} is negative")
+    return depth_max * force_ascent + pressure_0 * work_core / (g * r_water)
 
-    if force_drag_descent <= 0:
-        print(f"{surname} force_drag_descent {force_drag_descent} is negative")
 
-    if force_drag_ascent <= 0:
-        print(f"{surname} force_drag_ascent {force_drag_ascent} is negative")
+@instrument
+def get_total_work(
+    surname,
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    diagnostics=False,
+):
+    """Calculation of the mechanical work spent for the descent
+
+    depth_max   = depth_max
+    mass_body    = mass of the body
+    mass_ballast : mass of the ballast
+    volume_incompress   = get_volume_tissues(mass_body, mass_ballast, volume_suit, volume_gas, speed_descent, speed_a, depth_eq_d, depth_eq_a) : volume of the incompressible (liquid and solid part) part of the body
+    volume_suit   = volume of the suit
+    volume_gas   = volume_lungs : volume of the compressible (gaseous part)  part of the body at p_0 pressure
+    speed_d   = descent speed
+    speed_a   = ascension speed
+    drag_coefficient : hydrodynamic drag constant
+    diagnostics : if True, also return the flags of the non physical configurations (see get_flags)
+    """
+
+    (
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+    ) = get_forces(
+        mass_body,
+        mass_ballast,
+        volume_incompress,
+        volume_suit,
+        volume_gas,
+        speed_descent,
+        speed_ascent,
+        drag_coefficient,
+    )
 
     force_descent = force_drag_descent - force_weight + force_archimede1
     force_ascent = force_drag_ascent + force_weight - force_archimede1
 
-    pressure_depth_max = pressure_0 + depth_max * g * r_water
+    flags = get_flags(
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+        force_descent,
+        force_ascent,
+    )
+    if any(flags.values()):
+        record_flags(flags, surname)
 
     def robust_log(value):
         if "uncertain" in str(type(value)):
@@ -164,35 +271,560 @@ def get_total_work(
             return unc.ufloat(np.log(value.nominal_value), er)
         return np.log(value)
 
-    if force_descent >= 0:
-        # force_descent should < 0. Otherwise, it means that diver is not going deep enough to get out the gliding zone.
-        print(
-            f"{surname} force_desc should be < 0 mb({mass_ballast}) vl({volume_gas}) vi({volume_incompress:.3f}):",
-            f"desc({force_descent})=drag({force_drag_descent}) - wei({force_weight:.0f}) + arch1({force_archimede1:.0f}); arch2={force_archimede2:.0f}",
-        )
+    if flags["force_descent"]:
         force_descent *= -1
 
-    if force_ascent <= 0:
-        # force_ascent should > 0. Otherwise, it means that diver is not going deep enough to get out the gliding zone.
-        print(
-            f"{surname} force_asc should > 0 mb({mass_ballast}) vl({volume_gas}) vi({volume_incompress:.3f}):",
-            f"asc({force_ascent})=drag({force_drag_ascent}) + wei({force_weight:.0f}) - arch1({force_archimede1:.0f}); arch2={force_archimede2:.0f}",
-        )
+    if flags["force_ascent"]:
         force_ascent *= -1
 
-    work_core = force_ascent - force_descent - 2 * force_archimede2
-    work_core += -force_archimede2 * robust_log(pressure_depth_max / pressure_0)
-    work_core += force_archimede2 * robust_log(force_archimede2 / force_ascent)
-    work_core += force_archimede2 * robust_log(-force_archimede2 / force_descent)
+    work = get_work(depth_max, force_descent, force_ascent, force_archimede2, log=robust_log)
+    return (work, flags) if diagnostics else work
+
+
+def get_flags(
+    force_weight,
+    force_archimede1,
+    force_archimede2,
+    force_drag_descent,
+    force_drag_ascent,
+    force_descent,
+    force_ascent,
+) -> dict:
+    """Non physical configurations (see flag_messages), booleans or boolean masks of arrays of forces"""
+    return {
+        "force_weight": force_weight <= 0,
+        "force_archimede1": force_archimede1 <= 0,
+        "force_archimede2": force_archimede2 <= 0,
+        "force_drag_descent": force_drag_descent <= 0,
+        "force_drag_ascent": force_drag_ascent <= 0,
+        "force_descent": force_descent >= 0,
+        "force_ascent": force_ascent <= 0,
+    }
+
+
+def record_flags(flags, surname="", log=True) -> None:
+    """Count the non physical configurations in flag_counts and log them (rate limited)"""
+    for flag, value in flags.items():
+        count = int(value) if isinstance(value, (bool, np.bool_)) else int(np.count_nonzero(value))
+        if count:
+            flag_counts[flag] += count
+            if log:
+                logger.warning("%s %s in %d configuration(s)", surname, flag_messages[flag], count, extra={"flag": flag})
+
+
+def get_net_forces(
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+):
+    """Vectorized calculation of the net forces used by the work closed-form
+
+    Non-physical force signs are flipped with masks instead of python branches (see get_total_work).
+
+    return force_descent, force_ascent, force_archimede2, sign_descent, sign_ascent
+    """
+
+    (
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+    ) = get_forces(
+        *[
+            np.asarray(v, dtype=float)
+            for v in [
+                mass_body,
+                mass_ballast,
+                volume_incompress,
+                volume_suit,
+                volume_gas,
+                speed_descent,
+                speed_ascent,
+                drag_coefficient,
+            ]
+        ]
+    )
+
+    force_descent = force_drag_descent - force_weight + force_archimede1
+    force_ascent = force_drag_ascent + force_weight - force_archimede1
 
-    work = depth_max * force_ascent + pressure_0 * work_core / (g * r_water)
+    sign_descent = np.where(force_descent >= 0, -1.0, 1.0)
+    sign_ascent = np.where(force_ascent <= 0, -1.0, 1.0)
 
-    return work
+    return (
+        sign_descent * force_descent,
+        sign_ascent * force_ascent,
+        force_archimede2,
+        sign_descent,
+        sign_ascent,
+    )
+
+
+def get_total_work_batch(
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    diagnostics=False,
+):
+    """Vectorized calculation of the mechanical work spent for the dive
+
+    Same inputs as get_total_work (without the surname), given as numpy arrays,
+    pandas Series or floats which are broadcast together.
+    diagnostics : if True, also return the masks of the non physical configurations (see get_flags),
+    which are counted in flag_counts (not logged)
+
+    return work array
+    """
+
+    inputs = [mass_body, mass_ballast, volume_incompress, volume_suit, volume_gas, speed_descent, speed_ascent, drag_coefficient]
+    force_descent, force_ascent, force_archimede2, sign_descent, sign_ascent = get_net_forces(*inputs)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        work = get_work(np.asarray(depth_max, dtype=float), force_descent, force_ascent, force_archimede2, log=np.log)
+
+    if not diagnostics:
+        return work
+
+    force_weight, force_archimede1, _, force_drag_descent, force_drag_ascent = get_forces(
+        *[np.asarray(v, dtype=float) for v in inputs]
+    )
+    flags = get_flags(
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+        sign_descent * force_descent,
+        sign_ascent * force_ascent,
+    )
+    flags = {k: np.broadcast_to(v, np.shape(work)) for k, v in flags.items()}
+    record_flags(flags, log=False)
+
+    return work, flags
+
+
+def get_total_work_gliding(
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    depth_gliding_descent,
+    depth_gliding_ascent,
+):
+    """Vectorized mechanical work as a function of the gliding depths, the tissues volume and the drag coefficient
+    being estimated from them
+
+    Only arithmetic operations and logarithms are used (the signs are flipped from the nominal values),
+    so that the gliding depths errors can be propagated with uncertainty.propagate (both backends)
+
+    return work array
+    """
+
+    volume_tissues = get_volume_tissues(
+        mass_body,
+        mass_ballast,
+        volume_suit,
+        volume_gas,
+        speed_descent,
+        speed_ascent,
+        depth_gliding_descent,
+        depth_gliding_ascent,
+    )
+    drag_coefficient = get_drag_coefficient(
+        volume_suit, volume_gas, speed_descent, speed_ascent, depth_gliding_descent, depth_gliding_ascent
+    )
+
+    (
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+    ) = get_forces(
+        mass_body,
+        mass_ballast,
+        volume_tissues,
+        volume_suit,
+        volume_gas,
+        speed_descent,
+        speed_ascent,
+        drag_coefficient,
+    )
+
+    force_descent = force_drag_descent - force_weight + force_archimede1
+    force_ascent = force_drag_ascent + force_weight - force_archimede1
+
+    # Nominal values of floats, complex (complex step) or ufloat arrays
+    def get_nominal(value):
+        return unumpy.nominal_values(value) if np.asarray(value).dtype == object else np.real(value)
+
+    force_descent = force_descent * np.where(get_nominal(force_descent) >= 0, -1.0, 1.0)
+    force_ascent = force_ascent * np.where(get_nominal(force_ascent) <= 0, -1.0, 1.0)
+
+    log = unumpy.log if np.asarray(force_descent).dtype == object else np.log
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return get_work(depth_max, force_descent, force_ascent, force_archimede2, log=log)
+
+
+def get_total_work_integral(
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    points=1001,
+):
+    """Mechanical work integrated numerically along a depth grid, for any speed profiles (vectorized)
+
+    The thrust at depth z is drag - (weight - buoyancy(z)) during the descent, and drag + (weight - buoyancy(z))
+    during the ascent, the compressible buoyancy following pressure_0 / P(z). The diver only spends work when
+    the thrust is positive (gliding otherwise), so that there is no sign to flip. At constant speeds,
+    the closed form get_total_work_batch is recovered when both gliding depths are between the surface
+    and depth_max (the closed form assumes that the thrust changes sign once in each phase).
+
+    Same inputs as get_total_work_batch, except for the speeds which can also be functions
+    of the depth array (shape of the inputs + (points,)), as np.interp of a measured profile
+    points : number of points of the depth grid, from the surface to depth_max (trapezoidal rule)
+
+    return work array
+    """
+
+    inputs = [mass_body, mass_ballast, volume_incompress, volume_suit, volume_gas, 0, 0, drag_coefficient]
+    force_weight, force_archimede1, force_archimede2, _, _ = get_forces(
+        *[np.asarray(v, dtype=float)[..., None] for v in inputs]
+    )
+
+    depth = np.asarray(depth_max, dtype=float)[..., None] * np.linspace(0, 1, points)
+    force_static = force_weight - force_archimede1 - force_archimede2 * pressure_0 / (pressure_0 + g * r_water * depth)
+
+    def get_speed(speed):
+        return speed(depth) if callable(speed) else np.asarray(speed, dtype=float)[..., None]
+
+    drag_coefficient = np.asarray(drag_coefficient, dtype=float)[..., None]
+    thrust = np.maximum(drag_coefficient * get_speed(speed_descent) ** 2 - force_static, 0)
+    thrust += np.maximum(drag_coefficient * get_speed(speed_ascent) ** 2 + force_static, 0)
+
+    # Trapezoidal rule on the uniform grid
+    step = depth[..., 1] - depth[..., 0]
+    return step * (thrust.sum(axis=-1) - (thrust[..., 0] + thrust[..., -1]) / 2)
+
+
+def get_total_work_derivatives(
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+):
+    """Closed-form gradient and hessian of the work with respect to (mass_ballast, volume_suit)
+
+    Same inputs as get_total_work_batch.
+    The gear only acts on the work through force_descent, force_ascent (via the net weight
+    of the incompressible part) and force_archimede2 (via the suit).
+
+    return work, gradient (shape 2 x ...), hessian (shape 2 x 2 x ...)
+    """
+
+    depth_max = np.asarray(depth_max, dtype=float)
+    force_descent, force_ascent, force_archimede2, sign_descent, sign_ascent = get_net_forces(
+        mass_body,
+        mass_ballast,
+        volume_incompress,
+        volume_suit,
+        volume_gas,
+        speed_descent,
+        speed_ascent,
+        drag_coefficient,
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        work = get_work(depth_max, force_descent, force_ascent, force_archimede2, log=np.log)
+
+        k = pressure_0 / (g * r_water)
+        log_pressure = np.log((pressure_0 + depth_max * g * r_water) / pressure_0)
+
+        # Partial derivatives of the work with respect to the forces
+        w_a = depth_max + k * (1 - force_archimede2 / force_ascent)
+        w_d = -k * (1 + force_archimede2 / force_descent)
+        w_2 = k * (2 * np.log(force_archimede2) - np.log(force_ascent) - np.log(-force_descent) - log_pressure)
+
+        w_aa = k * force_archimede2 / force_ascent**2
+        w_dd = k * force_archimede2 / force_descent**2
+        w_a2 = -k / force_ascent
+        w_d2 = -k / force_descent
+        w_22 = 2 * k / force_archimede2
+
+    # Derivatives of the net buoyancy (force_archimede1 - force_weight) and of force_archimede2
+    # with respect to mass_ballast and volume_suit
+    dnet = np.array([g * (r_water / r_ballast - 1), g * r_nfoam * (r_water / r_neo - 1)])
+    darchimede2 = np.array([0.0, g * r_water * (1 - r_nfoam / r_neo)])
+
+    da = [-sign_ascent * dn for dn in dnet]
+    dd = [sign_descent * dn for dn in dnet]
+
+    gradient = np.stack([w_a * da[i] + w_d * dd[i] + w_2 * darchimede2[i] for i in range(2)])
+    hessian = np.stack(
+        [
+            np.stack(
+                [
+                    w_aa * da[i] * da[j]
+                    + w_dd * dd[i] * dd[j]
+                    + w_a2 * (da[i] * darchimede2[j] + darchimede2[i] * da[j])
+                    + w_d2 * (dd[i] * darchimede2[j] + darchimede2[i] * dd[j])
+                    + w_22 * darchimede2[i] * darchimede2[j]
+                    for j in range(2)
+                ]
+            )
+            for i in range(2)
+        ]
+    )
+
+    return work, gradient, hessian
+
+
+def get_best_ballast(
+    depth_max,
+    mass_body,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    bounds=(0, 5),
+):
+    """Closed-form of the ballast minimizing the work at fixed suit volume (vectorized)
+
+    The ballast only acts through the net buoyancy N = force_archimede1 - force_weight.
+    With x = -N, force_descent = force_drag_descent - x < 0 and force_ascent = force_drag_ascent + x > 0,
+    the stationarity of the work reads 1 / force_ascent - 1 / force_descent = (depth_max + 2 k) / (k force_archimede2)
+    with k = pressure_0 / (g r_water), a quadratic equation with one root such that force_descent < 0.
+    The work is convex in x on this domain, so the solution is clipped to the bounds.
+
+    return mass_ballast
+    """
+
+    (
+        force_weight,
+        force_archimede1,
+        force_archimede2,
+        force_drag_descent,
+        force_drag_ascent,
+    ) = get_forces(
+        *[
+            np.asarray(v, dtype=float)
+            for v in [mass_body, 0, volume_incompress, volume_suit, volume_gas, speed_descent, speed_ascent, drag_coefficient]
+        ]
+    )
+
+    k = pressure_0 / (g * r_water)
+    c = (np.asarray(depth_max, dtype=float) + 2 * k) / (k * force_archimede2)
+
+    # c x**2 + b x + a = 0, the largest root is the one with x > force_drag_descent
+    b = c * (force_drag_ascent - force_drag_descent) - 2
+    a = -(c * force_drag_ascent * force_drag_descent + force_drag_ascent - force_drag_descent)
+    x = (-b + np.sqrt(b**2 - 4 * c * a)) / (2 * c)
+
+    # Net buoyancy without ballast, and its derivative with respect to the ballast
+    net_buoyancy = force_archimede1 - force_weight
+    dnet_buoyancy = g * (r_water / r_ballast - 1)
+
+    return np.clip((-x - net_buoyancy) / dnet_buoyancy, *bounds)
+
+
+def minimize_batch(
+    depth_max,
+    mass_body,
+    volume_incompress,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    initial_guess=(1, 1.5),
+    bounds=((0, 5), (0, 10)),
+    starts=((0, 0), (5, 0), (0, 10), (5, 10)),
+    tol=1e-6,
+    max_iter=100,
+):
+    """Gear minimization of N divers at once with a vectorized projected Newton method
+
+    Inputs are arrays (or floats) of the divers characteristics, broadcast together.
+    Parameters are mass_ballast (kg) and thickness_suit (mm), as in Diver.minimize.
+    starts : additional initial guesses. The work diverges where the forces change sign,
+    which splits the domain in several basins: the best physical solution over all starts is kept.
+    tol : tolerance on the projected gradient step
+
+    return dict of arrays mass_ballast, thickness_suit, work, nfev and converged
+    """
+
+    characteristics = np.broadcast_arrays(
+        *[
+            np.asarray(v, dtype=float)
+            for v in [depth_max, mass_body, volume_incompress, volume_gas, speed_descent, speed_ascent, drag_coefficient]
+        ]
+    )
+    shape = characteristics[0].shape
+
+    # All the starts are solved in the same batch
+    guesses = np.array([initial_guess] + list(starts), dtype=float)
+    depth_max, mass_body, volume_incompress, volume_gas, speed_descent, speed_ascent, drag_coefficient = [
+        np.tile(c.ravel(), len(guesses)) for c in characteristics
+    ]
+
+    # Volume of the suit for a thickness in mm
+    scale = np.array([1, 2 / 1000])[:, None]
+
+    def get_derivatives(x):
+        work, gradient, hessian = get_total_work_derivatives(
+            depth_max,
+            mass_body,
+            x[0],
+            volume_incompress,
+            x[1] * scale[1],
+            volume_gas,
+            speed_descent,
+            speed_ascent,
+            drag_coefficient,
+        )
+        return work, gradient * scale, hessian * (scale * scale.T)[:, :, None]
+
+    def get_work(x):
+        return get_total_work_batch(
+            depth_max,
+            mass_body,
+            x[0],
+            volume_incompress,
+            x[1] * scale[1],
+            volume_gas,
+            speed_descent,
+            speed_ascent,
+            drag_coefficient,
+        )
+
+    lower = np.array([b[0] for b in bounds], dtype=float)[:, None]
+    upper = np.array([b[1] for b in bounds], dtype=float)[:, None]
+    x = np.clip(np.repeat(guesses.T, len(depth_max) // len(guesses), axis=1), lower, upper)
+    converged = np.zeros(len(depth_max), dtype=bool)
+    nfev = np.zeros(len(depth_max), dtype=int)
+
+    for _ in range(max_iter):
+        work, gradient, hessian = get_derivatives(x)
+        nfev += ~converged
+
+        # Parameters blocked by a bound are removed from the Newton step
+        free = ~(((x <= lower) & (gradient > 0)) | ((x >= upper) & (gradient < 0)))
+        gradient = np.where(free, gradient, 0)
+
+        h00 = np.where(free[0], hessian[0, 0], 1)
+        h11 = np.where(free[1], hessian[1, 1], 1)
+        h01 = np.where(free[0] & free[1], hessian[0, 1], 0)
+        det = h00 * h11 - h01**2
+
+        # Newton step where the reduced hessian is definite positive, scaled gradient step otherwise
+        with np.errstate(divide="ignore", invalid="ignore"):
+            is_newton = (h00 > 0) & (det > 0)
+            step = np.where(
+                is_newton,
+                -np.stack([h11 * gradient[0] - h01 * gradient[1], h00 * gradient[1] - h01 * gradient[0]]) / det,
+                -gradient / np.maximum(np.abs(np.stack([h00, h11])), 1e-12),
+            )
+        step = np.where(np.isfinite(step), step, 0)
+
+        converged |= np.max(np.abs(np.clip(x + step, lower, upper) - x), axis=0) < tol
+        if converged.all():
+            break
+
+        # Projected backtracking line search (Armijo rule)
+        alpha = np.where(converged, 0.0, 1.0)
+        accepted = converged.copy()
+        x_new = x.copy()
+        for _ in range(30):
+            x_try = np.clip(x + alpha * step, lower, upper)
+            work_try = get_work(x_try)
+            nfev += ~accepted
+            with np.errstate(invalid="ignore"):
+                ok = ~accepted & (work_try <= work + 1e-4 * np.sum(gradient * (x_try - x), axis=0))
+            x_new[:, ok] = x_try[:, ok]
+            accepted |= ok
+            if accepted.all():
+                break
+            alpha = np.where(accepted, alpha, alpha / 2)
+
+        # No decrease can be found anymore
+        converged |= ~accepted
+        x = x_new
+
+    # Best start for each diver, preferring the solutions where no force sign had to be flipped
+    work = get_work(x).reshape(len(guesses), -1)
+    _, _, _, sign_descent, sign_ascent = get_net_forces(
+        mass_body, x[0], volume_incompress, x[1] * scale[1], volume_gas, speed_descent, speed_ascent, drag_coefficient
+    )
+    is_physical = ((sign_descent > 0) & (sign_ascent > 0)).reshape(work.shape)
+    score = np.where(np.isnan(work), np.inf, work)
+    score = np.where(is_physical | ~is_physical.any(axis=0), score, np.inf)
+    best = np.argmin(score, axis=0)
+    index = best * work.shape[1] + np.arange(work.shape[1])
+
+    return {
+        "mass_ballast": x[0, index].reshape(shape),
+        "thickness_suit": x[1, index].reshape(shape),
+        "work": work[best, np.arange(work.shape[1])].reshape(shape),
+        "nfev": nfev.reshape(len(guesses), -1).sum(axis=0).reshape(shape),
+        "converged": converged[index].reshape(shape),
+    }
+
+
+def get_seconds(dtime) -> int:
+    """Duration in seconds from a number of seconds or a "minutes:seconds" value"""
+    if type(dtime) in [float, int]:
+        return int(dtime)
+
+    times = str(dtime).split(":")
+    return int(float(times[0]) * 60 + float(times[1]))
 
 
 class Diver:
     database_filename = "freediving_data.csv"
 
+    # Derived quantities and minimizations of the divers already seen, keyed by the inputs hash
+    # Set Diver.cache = LRUCache(maxsize=0) to disable it
+    cache = LRUCache(maxsize=256)
+    derived_quantities = [
+        "time_descent",
+        "time_ascent",
+        "speed_descent",
+        "speed_ascent",
+        "depth_gliding_descent",
+        "depth_gliding_ascent",
+        "volume_suit",
+        "volume_tissues",
+        "drag_coefficient",
+        "total_work",
+    ]
+
     def get_speed(self, phase):
         if f"speed_{phase}" in self.data:
             return self.data[f"speed_{phase}"]
@@ -200,13 +832,9 @@ class Diver:
         return self.data["depth_max"] / float(self.get_time(phase))
 
     def get_time(self, phase):
-        dtime = self.data[f"time_{phase}"]
-        if type(dtime) in [float, int]:
-            return int(dtime)
-
-        times = str(dtime).split(":")
-        return int(float(times[0]) * 60 + float(times[1]))
+        return get_seconds(self.data[f"time_{phase}"])
 
+    @instrument
     def __init__(self, data: dict) -> None:
         self.data = data
         for c in [
@@ -219,6 +847,17 @@ class Diver:
         ]:
             setattr(self, c, data[c])
 
+        self.data_key = get_key(data)
+        derived = Diver.cache.get(("derived", self.data_key))
+        if derived is None:
+            self.set_derived_quantities()
+            Diver.cache.set(("derived", self.data_key), {c: getattr(self, c) for c in Diver.derived_quantities})
+        else:
+            self.__dict__.update(derived)
+
+    def set_derived_quantities(self) -> None:
+        data = self.data
+
         self.time_descent = self.get_time("descent")
         self.time_ascent = self.get_time("ascent")
 
@@ -275,95 +914,180 @@ class Diver:
             self.drag_coefficient,
         )
 
-    def minimize(self, method=None, verbose=True) -> None:
-        # Function to minimize with respect to the user characteristics
-        # mb and Tsmm variables to minimize
-        # The different versions are used to estimate the uncertainty
-        def f(param):
-            mb, ts = param
-            return get_total_work(
-                self.surname,
-                self.depth_max,
-                self.mass_body,
-                mb,
-                self.volume_tissues.n,
-                ts / 1000 * 2,
-                self.volume_lungs,
-                self.speed_descent,
-                self.speed_ascent,
-                self.drag_coefficient.n,
-            )
+    def get_objective(self, volume_tissues, drag_coefficient, jac=False):
+        """Work to minimize as a function of param = (mass_ballast, thickness_suit)
+
+        volume_tissues, drag_coefficient : nominal values used for the minimization
+        jac : if True, return the work and its closed-form gradient
 
-        def fplusVt(param):
+        return the objective and its hessian (None if jac is False)
+        """
+
+        # Volume of the suit for a thickness in mm
+        dvolume_suit = 2 / 1000
+        scale = np.array([1, dvolume_suit])
+
+        def get_derivatives(param):
             mb, ts = param
-            return get_total_work(
-                self.surname,
+            return get_total_work_derivatives(
                 self.depth_max,
                 self.mass_body,
                 mb,
-                self.volume_tissues.n + self.volume_tissues.s,
-                ts / 1000 * 2,
+                volume_tissues,
+                ts * dvolume_suit,
                 self.volume_lungs,
                 self.speed_descent,
                 self.speed_ascent,
-                self.drag_coefficient.n,
+                drag_coefficient,
             )
 
-        def fminusVt(param):
+        def f(param):
             mb, ts = param
             return get_total_work(
                 self.surname,
                 self.depth_max,
                 self.mass_body,
                 mb,
-                self.volume_tissues.n - self.volume_tissues.s,
-                ts / 1000 * 2,
+                volume_tissues,
+                ts * dvolume_suit,
                 self.volume_lungs,
                 self.speed_descent,
                 self.speed_ascent,
-                self.drag_coefficient.n,
+                drag_coefficient,
             )
 
-        def fplusC(param):
-            mb, ts = param
-            return get_total_work(
-                self.surname,
+        def fjac(param):
+            work, gradient, _ = get_derivatives(param)
+            return float(work), gradient * scale
+
+        def fhess(param):
+            return get_derivatives(param)[2] * np.outer(scale, scale)
+
+        return (fjac, fhess) if jac else (f, None)
+
+    def minimize_reduced(self, volume_tissues, drag_coefficient, bounds=((0, 5), (0, 10))):
+        """Closed-form ballast for a given suit thickness (see get_best_ballast),
+        and bounded 1-D minimization over the suit thickness"""
+        from scipy.optimize import OptimizeResult, minimize_scalar
+
+        def get_ballast(ts):
+            return get_best_ballast(
                 self.depth_max,
                 self.mass_body,
-                mb,
-                self.volume_tissues.n,
-                ts / 1000 * 2,
+                volume_tissues,
+                ts * 2 / 1000,
                 self.volume_lungs,
                 self.speed_descent,
                 self.speed_ascent,
-                self.drag_coefficient.n + self.drag_coefficient.s,
+                drag_coefficient,
+                bounds=bounds[0],
             )
 
-        def fminusC(param):
-            mb, ts = param
-            return get_total_work(
-                self.surname,
-                self.depth_max,
-                self.mass_body,
-                mb,
-                self.volume_tissues.n,
-                ts / 1000 * 2,
-                self.volume_lungs,
-                self.speed_descent,
-                self.speed_ascent,
-                self.drag_coefficient.n - self.drag_coefficient.s,
+        def f(ts):
+            return float(
+                get_total_work_batch(
+                    self.depth_max,
+                    self.mass_body,
+                    get_ballast(ts),
+                    volume_tissues,
+                    ts * 2 / 1000,
+                    self.volume_lungs,
+                    self.speed_descent,
+                    self.speed_ascent,
+                    drag_coefficient,
+                )
             )
 
+        res = minimize_scalar(f, bounds=bounds[1], method="bounded", options=dict(xatol=1e-6))
+        return OptimizeResult(x=np.array([get_ballast(res.x), res.x]), fun=res.fun, nfev=res.nfev, success=res.success)
+
+    def minimize(self, method=None, verbose=True, jac=False, initial_guess=None) -> None:
+        """Gear minimizing the work with respect to the user characteristics
+
+        method : scipy.optimize.minimize method (L-BFGS-B by default), or "reduced" for the closed-form
+        ballast and 1-D search over the suit thickness (see minimize_reduced)
+        jac : if True, use the closed-form gradient (and hessian for trust-constr)
+        instead of finite differences
+        initial_guess : (mass_ballast, thickness_suit) or a previous solution to warm start the nominal
+        problem from (ignored by the reduced method). Warm started solutions are cached apart from the cold ones
+        """
+
+        if isinstance(initial_guess, dict):
+            initial_guess = [initial_guess["mass_ballast_best"], initial_guess["thickness_suit_best"]]
+        if method == "reduced":
+            initial_guess = None
+        guess_key = None if initial_guess is None else tuple(round(float(v), 3) for v in initial_guess)
+
+        cache_key = ("minimize", self.data_key, method, jac, guess_key)
+        solution = Diver.cache.get(cache_key)
+        if solution is None:
+            solution = self.get_solution(method=method, jac=jac, initial_guess=initial_guess)
+            Diver.cache.set(cache_key, solution)
+
+        if verbose:
+            print(f"Best ballast weight \t\t= {solution['mass_ballast_best']} kg")
+            print(f"Average optimal ballast weight \t= {solution['mass_ballast_proposal']} kg")
+            print(f"Best suite thickness \t\t= {solution['thickness_suit_best']} mm")
+            print(f"Average optimal suite thickness \t= {solution['thickness_suit_proposal']} mm\n")
+            print(f"Performance gain = {solution['gain']} %")
+
+        return dict(solution)
+
+    def get_solution(self, method=None, jac=False, initial_guess=None) -> dict:
+        from scipy.optimize import minimize
+
+        # mb and Tsmm variables to minimize
+        # The different versions are used to estimate the uncertainty
+        volume_tissues, drag_coefficient = self.volume_tissues, self.drag_coefficient
+        problems = [
+            (volume_tissues.n, drag_coefficient.n),
+            (volume_tissues.n + volume_tissues.s, drag_coefficient.n),
+            (volume_tissues.n - volume_tissues.s, drag_coefficient.n),
+            (volume_tissues.n, drag_coefficient.n + drag_coefficient.s),
+            (volume_tissues.n, drag_coefficient.n - drag_coefficient.s),
+        ]
+
         # Minimize with bounds
         # Parameters are mass_ballast, thickness_suit
-        initial_guess = [1, 1.5]
         bounds = ((0, 5), (0, 10))
+        default_guess = np.array([1, 1.5])
+        warm_start = initial_guess is not None and method != "reduced"
+        if initial_guess is None:
+            initial_guess = default_guess
+        elif isinstance(initial_guess, dict):
+            initial_guess = [initial_guess["mass_ballast_best"], initial_guess["thickness_suit_best"]]
+        initial_guess = np.clip(np.asarray(initial_guess, dtype=float), *np.transpose(bounds))
+
+        def solve(vt, c, x0):
+            fun, hess = self.get_objective(vt, c, jac=jac)
+            if method != "trust-constr":
+                hess = None
+            with timer(f"scipy.optimize.minimize ({method or 'L-BFGS-B'})") as stats:
+                result = minimize(fun, x0, bounds=bounds, method=method, jac=jac, hess=hess)
+                stats["nfev"] = result.nfev
+            return result
+
         # Working minimization L-BFGS-B, TNC, SLSQP
-        res = minimize(f, initial_guess, bounds=bounds, method=method)
-        resplusVt = minimize(fplusVt, initial_guess, bounds=bounds, method=method)
-        resminusVt = minimize(fminusVt, initial_guess, bounds=bounds, method=method)
-        resplusC = minimize(fplusC, initial_guess, bounds=bounds, method=method)
-        resminusC = minimize(fminusC, initial_guess, bounds=bounds, method=method)
+        # Only the nominal problem is warm started, the perturbed ones (the uncertainty) start from the default guess
+        results = []
+        for i, (vt, c) in enumerate(problems):
+            if method == "reduced":
+                with timer("Diver.minimize_reduced") as stats:
+                    results.append(self.minimize_reduced(vt, c, bounds=bounds))
+                    stats["nfev"] = results[-1].nfev
+                continue
+
+            results.append(solve(vt, c, initial_guess if i == 0 else default_guess))
+
+        nfev = sum(r.nfev for r in results)
+
+        # The warm optimum is kept if it is in the basin of the cold minimization: force signs of the default guess,
+        # and no higher nominal work than the perturbed optima with these signs. Otherwise it is solved cold
+        if warm_start and not self.is_nominal_basin(results[0].x, default_guess, [r.x for r in results[1:]]):
+            results[0] = solve(*problems[0], default_guess)
+            nfev += results[0].nfev
+
+        res, resplusVt, resminusVt, resplusC, resminusC = results
 
         mass_ballast_best = res.x[0]
         mb_plusVt = resplusVt.x[0]
@@ -405,13 +1129,6 @@ class Diver:
 
         gain = work_proposal / self.total_work.n - 1
 
-        if verbose:
-            print(f"Best ballast weight \t\t= {mass_ballast_best} kg")
-            print(f"Average optimal ballast weight \t= {mass_ballast_proposal} kg")
-            print(f"Best suite thickness \t\t= {thickness_suit_best} mm")
-            print(f"Average optimal suite thickness \t= {thickness_suit_proposal} mm\n")
-            print(f"Performance gain = {gain * 100} %")
-
         return {
             "surname": self.surname,
             "work": self.total_work.n,
@@ -421,61 +1138,206 @@ class Diver:
             "thickness_suit_best": thickness_suit_best,
             "thickness_suit_proposal": thickness_suit_proposal,
             "gain": gain * 100,
+            "nfev": nfev,
         }
 
-    def get_total_work(self, variable=None):
-        volume_lungs = [self.volume_lungs]
-        mass_ballast = [self.mass_ballast]
-        depth_max = [self.depth_max]
-        speed_factors = [1.0]
-        volume_tissues = [self.volume_tissues.n]
-        volume_suits = [self.volume_suit]
+    def is_nominal_basin(self, param, start, references) -> bool:
+        """Whether param = (mass_ballast, thickness_suit) has the force signs of start,
+        and no higher nominal work than the references with these signs"""
+
+        def get_status(param):
+            work, flags = get_total_work(
+                self.surname,
+                self.depth_max,
+                self.mass_body,
+                param[0],
+                self.volume_tissues.n,
+                param[1] * 2 / 1000,
+                self.volume_lungs,
+                self.speed_descent,
+                self.speed_ascent,
+                self.drag_coefficient.n,
+                diagnostics=True,
+            )
+            return work, (bool(flags["force_descent"]), bool(flags["force_ascent"]))
+
+        work, signs = get_status(param)
+        signs_start = get_status(start)[1]
+        works = [w for w, s in map(get_status, references) if s == signs_start]
+        return signs == signs_start and work <= min(works, default=work)
+
+    def simulate(self, mass_ballast=None, thickness_suit=None, **kwargs) -> dict:
+        """Time-resolved dive (see simulation.simulate), with the diver gear or the given one
+        (mass_ballast and thickness_suit can be arrays to simulate several configurations at once)"""
+        from .simulation import simulate
+
+        mass_ballast = self.mass_ballast if mass_ballast is None else mass_ballast
+        thickness_suit = self.thickness_suit if thickness_suit is None else np.asarray(thickness_suit)
+        return simulate(
+            self.depth_max,
+            self.mass_body,
+            mass_ballast,
+            self.volume_tissues.n,
+            thickness_suit * 2 / 1000,
+            self.volume_lungs,
+            self.speed_descent,
+            self.speed_ascent,
+            self.drag_coefficient.n,
+            **kwargs,
+        )
+
+    def minimize_montecarlo(self, samples=1000, seed=None, percentiles=(5, 50, 95)):
+        """Gear minimization for samples of the gliding depths, solved in one batch
+
+        samples : number of draws of the gliding depths (normal law with the given errors)
+        seed : seed of the random generator
+        percentiles : percentiles of the optimal gear and of the gain
+
+        return percentiles (index) of mass_ballast_best, thickness_suit_best and gain (in %)
+        """
+        import pandas as pd
+
+        rng = np.random.default_rng(seed)
+        depth_gliding_descent = rng.normal(self.depth_gliding_descent.n, self.depth_gliding_descent.s, samples)
+        depth_gliding_ascent = rng.normal(self.depth_gliding_ascent.n, self.depth_gliding_ascent.s, samples)
+
+        volume_tissues = get_volume_tissues(
+            self.mass_body,
+            self.mass_ballast,
+            self.volume_suit,
+            self.volume_lungs,
+            self.speed_descent,
+            self.speed_ascent,
+            depth_gliding_descent,
+            depth_gliding_ascent,
+        )
+        drag_coefficient = get_drag_coefficient(
+            self.volume_suit,
+            self.volume_lungs,
+            self.speed_descent,
+            self.speed_ascent,
+            depth_gliding_descent,
+            depth_gliding_ascent,
+        )
+
+        res = minimize_batch(
+            self.depth_max,
+            self.mass_body,
+            volume_tissues,
+            self.volume_lungs,
+            self.speed_descent,
+            self.speed_ascent,
+            drag_coefficient,
+        )
+        work = get_total_work_batch(
+            self.depth_max,
+            self.mass_body,
+            self.mass_ballast,
+            volume_tissues,
+            self.volume_suit,
+            self.volume_lungs,
+            self.speed_descent,
+            self.speed_ascent,
+            drag_coefficient,
+        )
+
+        return pd.DataFrame(
+            {
+                "mass_ballast_best": np.nanpercentile(res["mass_ballast"], percentiles),
+                "thickness_suit_best": np.nanpercentile(res["thickness_suit"], percentiles),
+                "gain": np.nanpercentile((res["work"] / work - 1) * 100, percentiles),
+            },
+            index=pd.Index(percentiles, name="percentile"),
+        )
+
+    def get_total_work(self, variable=None, **grids):
+        """Total work of the diver, swept over grids of some characteristics
+
+        variable : 1-D sweep with default grid (mass_ballast, depth_max, speed_factor, Rt, volume_lungs or volume_suit)
+        grids : values of the swept characteristics among volume_lungs, mass_ballast, depth_max, speed_factor,
+        volume_tissues, volume_suit and thickness_suit (in mm), all evaluated in one broadcast operation
+
+        return the work (Joules) as a Series indexed by the grids (use unstack() for 2-D heatmaps)
+        """
+        import pandas as pd
 
         mass_total = self.mass_body + self.mass_ballast + r_nfoam * self.volume_suit
 
+        variables = ["mass_ballast", "depth_max", "speed_factor", "Rt", "volume_lungs", "volume_suit"]
+        if variable is not None and variable not in variables:
+            raise ValueError(f"variable '{variable}' is unknown, use one of {variables} or grids")
+        if variable is not None and grids:
+            raise ValueError("variable and grids can not be used together")
+        if {"volume_suit", "thickness_suit"} <= set(grids):
+            raise ValueError("volume_suit and thickness_suit grids sweep the same characteristic, use only one")
+
         if variable == "mass_ballast":
-            mass_ballast = (index := np.linspace(0, 5, 20))
+            grids = {variable: np.linspace(0, 5, 20)}
         elif variable == "depth_max":
-            depth_max = (index := np.linspace(0.8, 1.2, 10) * self.depth_max)
+            grids = {variable: np.linspace(0.8, 1.2, 10) * self.depth_max}
         elif variable == "speed_factor":
-            speed_factors = (index := np.linspace(0.8, 1.2, 10))
+            grids = {variable: np.linspace(0.8, 1.2, 10)}
         elif variable == "Rt":
-            volume_tissues = (mass_total / r_water) * (
-                index := np.linspace(0.8, 1.2, 10)
-            )
+            index = np.linspace(0.8, 1.2, 10)
+            grids = {"volume_tissues": (mass_total / r_water) * index}
         elif variable == "volume_lungs":
-            volume_lungs = (index := np.linspace(2, 10, 20))
+            grids = {variable: np.linspace(2, 10, 20)}
         elif variable == "volume_suit":
-            volume_suits = (index := np.linspace(0, 0.015, 20))
-        else:
-            index = None
+            grids = {variable: np.linspace(0, 0.015, 20)}
+
+        values = dict(
+            volume_lungs=self.volume_lungs,
+            mass_ballast=self.mass_ballast,
+            depth_max=self.depth_max,
+            speed_factor=1.0,
+            volume_tissues=self.volume_tissues.n,
+            volume_suit=self.volume_suit,
+        )
+
+        # Each grid is set on its own axis
+        for axis, (k, grid) in enumerate(grids.items()):
+            grid = np.asarray(grid, dtype=float)
+            if k == "thickness_suit":
+                k, grid = "volume_suit", (surface_suit := 2) * grid / 1000.0
+            if k not in values:
+                raise ValueError(f"'{k}' can not be swept")
+            values[k] = grid.reshape([-1 if a == axis else 1 for a in range(len(grids))])
+
+        total_work = get_total_work_batch(
+            values["depth_max"],
+            self.mass_body,
+            values["mass_ballast"],
+            values["volume_tissues"],
+            values["volume_suit"],
+            values["volume_lungs"],
+            self.speed_descent * values["speed_factor"],
+            self.speed_ascent * values["speed_factor"],
+            self.drag_coefficient.n,
+        )
+
+        if variable is None and not grids:
+            return [float(total_work)]
+
+        total_work = np.broadcast_to(total_work, [len(g) for g in grids.values()])
+
+        if variable is not None:
+            index = index if variable == "Rt" else grids[variable]
+            return pd.DataFrame({"Work (Joules)": total_work}, index=pd.Index(index, name=variable))
+
+        index = pd.MultiIndex.from_product([np.asarray(g) for g in grids.values()], names=list(grids))
+        return pd.Series(total_work.ravel(), index=index, name="Work (Joules)")
 
-        total_work = [
-            get_total_work(
-                self.surname,
-                dm,
-                self.mass_body,
-                mb,
-                vt,
-                vs,
-                l,
-                self.speed_descent * sf,
-                self.speed_ascent * sf,
-                self.drag_coefficient,
-            ).n
-            for l in volume_lungs
-            for mb in mass_ballast
-            for dm in depth_max
-            for sf in speed_factors
-            for vt in volume_tissues
-            for vs in volume_suits
-        ]
 
-        if index is None:
-            return total_work
+class WarmStarts:
+    """Last solution of each user, used as initial guess of their next minimization
+    (consecutive inputs of an interactive session only differ slightly)"""
 
-        df = (
-            pd.DataFrame([index, total_work], index=[variable, "Work (Joules)"]).T
-        ).set_index(variable)
+    def __init__(self, maxsize=128) -> None:
+        self.solutions = LRUCache(maxsize=maxsize)
 
-        return df
+    def minimize(self, diver, user=None, **kwargs) -> dict:
+        """Diver.minimize warm started from the previous solution of the user (surname by default)"""
+        user = diver.surname if user is None else user
+        solution = diver.minimize(initial_guess=self.solutions.get(user), **kwargs)
+        self.solutions.set(user, solution)
+        return solution
@@ -1,50 +1,127 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+import uncertainties as unc
+from uncertainties import unumpy
 
 from .diver import *
 from .constants import *
+from .memoize import LRUCache
+from .profiling import instrument
+from .uncertainty import propagate
 
 
-def get_data(surname=None, raw=False, clean=True, query=None):
-    df = pd.read_csv(Diver.database_filename)
+# Columns of the divers database (form export)
+database_columns = [
+    "timestamp",
+    "username",
+    "name",
+    "surname",
+    "depth_max",
+    "time_descent",
+    "time_ascent",
+    "depth_gliding_descent",
+    "depth_gliding_descent_error",
+    "depth_gliding_ascent",
+    "depth_gliding_ascent_error",
+    "volume_lungs",
+    "mass_body",
+    "mass_ballast",
+    "thickness_suit",
+    "mass_suit",
+    "model_suit",
+    "rights",
+]
 
-    df.columns = [
-        "timestamp",
-        "username",
-        "name",
-        "surname",
-        "depth_max",
-        "time_descent",
-        "time_ascent",
-        "depth_gliding_descent",
-        "depth_gliding_descent_error",
-        "depth_gliding_ascent",
-        "depth_gliding_ascent_error",
-        "volume_lungs",
-        "mass_body",
-        "mass_ballast",
-        "thickness_suit",
-        "mass_suit",
-        "model_suit",
-        "rights",
-    ]
+# Columns used for the analysis
+data_columns = [
+    "surname",
+    "depth_max",
+    "time_descent",
+    "time_ascent",
+    "depth_gliding_descent",
+    "depth_gliding_descent_error",
+    "depth_gliding_ascent",
+    "depth_gliding_ascent_error",
+    "volume_lungs",
+    "mass_body",
+    "mass_ballast",
+    "thickness_suit",
+    "mass_suit",
+]
 
-    df = df[
-        [
-            "surname",
-            "depth_max",
-            "time_descent",
-            "time_ascent",
-            "depth_gliding_descent",
-            "depth_gliding_descent_error",
-            "depth_gliding_ascent",
-            "depth_gliding_ascent_error",
-            "volume_lungs",
-            "mass_body",
-            "mass_ballast",
-            "thickness_suit",
-            "mass_suit",
-        ]
-    ]
+# Databases and cleaned data already loaded, keyed by the file and its modification time
+data_cache = LRUCache(maxsize=16)
+
+
+def format_database(df):
+    """Name and type the columns of the raw form export"""
+    df.columns = database_columns
+    for c in database_columns:
+        if c in ["timestamp", "username", "name", "surname", "model_suit", "rights"]:
+            df[c] = df[c].astype("string")
+        else:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    return df
+
+
+def read_database(filename=None):
+    """Typed database. The CSV file is converted once to a parquet file (if pyarrow is available)
+    which is used until the CSV file is modified"""
+    filename = filename or Diver.database_filename
+    mtime = os.path.getmtime(filename)
+    store = os.path.splitext(filename)[0] + ".parquet"
+
+    if os.path.exists(store) and os.path.getmtime(store) >= mtime:
+        try:
+            return pd.read_parquet(store)
+        except (ImportError, ValueError, OSError):
+            pass
+
+    df = format_database(pd.read_csv(filename))
+    try:
+        df.to_parquet(store, index=False)
+    except (ImportError, ValueError, OSError):
+        pass
+
+    return df
+
+
+def clean_data(df, clean=True, query=None):
+    """Fill missing values, add the suit volume and the speeds, and convert the lungs volume in m3"""
+    df["volume_lungs"] = df["volume_lungs"].clip(0, 10.0)
+    df["depth_gliding_descent_error"] = df["depth_gliding_descent_error"].fillna(3.0)
+    df["depth_gliding_ascent_error"] = df["depth_gliding_ascent_error"].fillna(3.0)
+    df["thickness_suit"] = df["thickness_suit"].fillna(r_nfoam * df["thickness_suit"] / 1000.0)
+
+    # Get suite volume in m3
+    df["volume_suit"] = (surface_suit := 2) * df["thickness_suit"] / 1000.0
+    df["speed_descent"] = df["depth_max"] / df["time_descent"]
+    df["speed_ascent"] = df["depth_max"] / df["time_ascent"]
+    df["volume_lungs"] = df["volume_lungs"] / 1000.0
+
+    # Remove problematic data
+    if clean:
+        df = df[~df.surname.isin(["Lauper", "Carbone", "Sodde", "Underwater Photography & Media"])]
+
+    if query:
+        df = df.query(query)
+
+    return df
+
+
+def load_data(raw=False, clean=True, query=None, timestamp=False):
+    """Divers data and the position of each surname, cached until the database is modified"""
+    filename = Diver.database_filename
+    key = (os.path.abspath(filename), os.path.getmtime(filename), raw, clean, query, timestamp)
+
+    cached = data_cache.get(key)
+    if cached is not None:
+        return cached
+
+    df = read_database(filename)[(["timestamp"] if timestamp else []) + data_columns]
 
     df = pd.concat(
         [
@@ -72,38 +149,162 @@ def get_data(surname=None, raw=False, clean=True, query=None):
     df.index = range(len(df))
 
     if not raw:
-        df["volume_lungs"] = df["volume_lungs"].clip(0, 10.0)
-        df["depth_gliding_descent_error"].fillna(3.0, inplace=True)
-        df["depth_gliding_ascent_error"].fillna(3.0, inplace=True)
-        df["thickness_suit"].fillna(r_nfoam * df["thickness_suit"] / 1000.0, inplace=True)
+        df = clean_data(df, clean=clean, query=query)
+
+    # First position of each surname
+    index = {}
+    for position, surname in enumerate(df["surname"]):
+        index.setdefault(surname, position)
+
+    data_cache.set(key, (df, index))
+    return df, index
+
+
+def stream(filename=None, chunksize=10000, clean=True, query=None, timestamp=False, optimize=False, **kwargs):
+    """Process a divers CSV file chunk by chunk, with a memory bounded by the chunk size
+
+    Each chunk is cleaned as get_data(), and the tissues volume, the drag coefficient and the work
+    are added with the vectorized formulas (see estimate).
+    optimize : if True, also add the gear minimization (kwargs are the divers.minimize parameters)
+
+    yield the processed chunks
+    """
+    for df in pd.read_csv(filename or Diver.database_filename, chunksize=chunksize):
+        df = format_database(df)[(["timestamp"] if timestamp else []) + data_columns]
+        df = clean_data(df, clean=clean, query=query)
+        if df.empty:
+            continue
+
+        if optimize:
+            yield split_errors(minimize(df, **kwargs))
+        else:
+            yield estimate(df)
+
 
-        # Get suite volume in m3
-        df["volume_suit"] = (surface_suit := 2) * df["thickness_suit"] / 1000.0
-        df["speed_descent"] = df["depth_max"] / df["time_descent"]
-        df["speed_ascent"] = df["depth_max"] / df["time_ascent"]
-        df["volume_lungs"] = df["volume_lungs"] / 1000.0
+def stream_to_csv(output, filename=None, **kwargs):
+    """Write the processed chunks of stream(filename, **kwargs) to the output CSV file
 
-        # Remove problematic data
-        if clean:
-            df = df[~df.surname.isin(["Lauper", "Carbone", "Sodde", "Underwater Photography & Media"])]
+    return the number of divers written
+    """
+    size = 0
+    for df in stream(filename, **kwargs):
+        df.to_csv(output, index=False, mode="a" if size else "w", header=not size)
+        size += len(df)
+    return size
 
-        if query:
-            df = df.query(query)
+
+@instrument(name="divers.get_data")
+def get_data(surname=None, raw=False, clean=True, query=None, timestamp=False):
+    """Divers data (or the Diver with the given surname or position)
+
+    raw : if True, no cleaning of the data
+    clean : if True, remove problematic divers
+    query : pandas query applied on the cleaned data
+    timestamp : if True, keep the timestamp of the form submissions
+    """
+    df, index = load_data(raw=raw, clean=clean, query=query, timestamp=timestamp)
 
     if surname is None:
-        return df
+        return df.copy()
     elif type(surname) == int:
         return Diver(df.iloc[surname].to_dict())
 
-    d = df.query(f"surname == '{surname}'")
-    if d.empty:
+    if surname not in index:
         raise ValueError(f"diver '{surname}' is unknown")
 
-    return Diver(d.iloc[0].to_dict())
+    return Diver(df.iloc[index[surname]].to_dict())
 
 
-def minimize():
-    df = get_data()
+def get_synthetic_data(size=100, seed=0):
+    """Random population of divers in the ranges of the app inputs, formatted as get_data()"""
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame(
+        {
+            "surname": [f"Diver {i}" for i in range(size)],
+            "depth_max": rng.integers(40, 131, size).astype(float),
+            "depth_gliding_descent": rng.integers(10, 31, size).astype(float),
+            "depth_gliding_descent_error": rng.integers(1, 6, size).astype(float),
+            "depth_gliding_ascent": rng.integers(2, 10, size).astype(float),
+            "depth_gliding_ascent_error": rng.integers(1, 6, size).astype(float),
+            "volume_lungs": rng.integers(4, 11, size) / 1000.0,
+            "mass_body": rng.integers(50, 101, size).astype(float),
+            "mass_ballast": rng.integers(0, 11, size) * 0.5,
+            "thickness_suit": rng.integers(0, 26, size) * 0.2,
+        }
+    )
+    df["time_descent"] = (df["depth_max"] / rng.uniform(0.7, 1.3, size)).round()
+    df["time_ascent"] = (df["depth_max"] / rng.uniform(0.7, 1.3, size)).round()
+
+    df["volume_suit"] = (surface_suit := 2) * df["thickness_suit"] / 1000.0
+    df["speed_descent"] = df["depth_max"] / df["time_descent"]
+    df["speed_ascent"] = df["depth_max"] / df["time_ascent"]
+    return df
+
+
+def get_errors(df, backend="numpy"):
+    """Propagate the gliding depths errors to the tissues volume and the drag coefficient
+
+    backend : "numpy" or "uncertainties", see uncertainty.propagate
+    """
+    errors = {
+        "depth_eq_d": df["depth_gliding_descent_error"].values,
+        "depth_eq_a": df["depth_gliding_ascent_error"].values,
+    }
+    inputs = dict(
+        volume_suit=df.volume_suit.values,
+        volume_gas=df.volume_lungs.values,
+        speed_d=df.speed_descent.values,
+        speed_a=df.speed_ascent.values,
+        depth_eq_d=df["depth_gliding_descent"].values,
+        depth_eq_a=df["depth_gliding_ascent"].values,
+    )
+
+    _, volume_tissues_error = propagate(
+        get_volume_tissues,
+        errors,
+        backend=backend,
+        mass_body=df.mass_body.values,
+        mass_ballast=df.mass_ballast.values,
+        **inputs,
+    )
+    _, drag_coefficient_error = propagate(get_drag_coefficient, errors, backend=backend, **inputs)
+    return volume_tissues_error, drag_coefficient_error
+
+
+def get_work_error(df, backend="numpy"):
+    """Propagate the gliding depths errors to the total work (through the tissues volume and the drag coefficient)
+
+    backend : "numpy" or "uncertainties", see uncertainty.propagate
+    """
+    _, total_work_error = propagate(
+        get_total_work_gliding,
+        {
+            "depth_gliding_descent": df["depth_gliding_descent_error"].values,
+            "depth_gliding_ascent": df["depth_gliding_ascent_error"].values,
+        },
+        backend=backend,
+        depth_max=df.depth_max.values,
+        mass_body=df.mass_body.values,
+        mass_ballast=df.mass_ballast.values,
+        volume_suit=df.volume_suit.values,
+        volume_gas=df.volume_lungs.values,
+        speed_descent=df.speed_descent.values,
+        speed_ascent=df.speed_ascent.values,
+        depth_gliding_descent=df["depth_gliding_descent"].values,
+        depth_gliding_ascent=df["depth_gliding_ascent"].values,
+    )
+    return total_work_error
+
+
+def estimate(df=None, errors=False, backend="numpy"):
+    """Add the tissues volume, the drag coefficient and the total work estimations to the divers data
+
+    errors : if True, also add the volume_tissues_error, drag_coefficient_error and total_work_error columns
+    backend : errors propagation backend, see uncertainty.propagate
+    """
+    if df is None:
+        df = get_data()
 
     df["volume_tissues"] = get_volume_tissues(
         df.mass_body,
@@ -123,9 +324,255 @@ def minimize():
         df["depth_gliding_descent"],
         df["depth_gliding_ascent"],
     )
+    df["total_work"] = get_total_work_batch(
+        df.depth_max,
+        df.mass_body,
+        df.mass_ballast,
+        df.volume_tissues,
+        df.volume_suit,
+        df.volume_lungs,
+        df.speed_descent,
+        df.speed_ascent,
+        df.drag_coefficient,
+    )
 
-    minimization = [Diver(df.loc[i].to_dict()).minimize(verbose=False) for i in df.index]
-    minimization = pd.DataFrame(minimization)
+    if errors:
+        df["volume_tissues_error"], df["drag_coefficient_error"] = get_errors(df, backend=backend)
+        df["total_work_error"] = get_work_error(df, backend=backend)
 
-    df = df.merge(minimization, on="surname")
     return df
+
+
+def minimize_population(df):
+    """Gear minimization of all the divers solved as one batched problem
+
+    Same outputs as Diver.minimize, the five versions used to estimate the uncertainty
+    of each diver are stacked in the batch.
+    df : divers data with the estimate(df, errors=True) columns
+    """
+
+    n = len(df)
+    volume_tissues, volume_tissues_error = df.volume_tissues.values, df.volume_tissues_error.values
+    drag_coefficient, drag_coefficient_error = df.drag_coefficient.values, df.drag_coefficient_error.values
+
+    def stack(column):
+        return np.tile(df[column].values, 5)
+
+    # nominal, plusVt, minusVt, plusC, minusC
+    res = minimize_batch(
+        stack("depth_max"),
+        stack("mass_body"),
+        np.concatenate(
+            [volume_tissues, volume_tissues + volume_tissues_error, volume_tissues - volume_tissues_error]
+            + [volume_tissues] * 2
+        ),
+        stack("volume_lungs"),
+        stack("speed_descent"),
+        stack("speed_ascent"),
+        np.concatenate(
+            [drag_coefficient] * 3 + [drag_coefficient + drag_coefficient_error, drag_coefficient - drag_coefficient_error]
+        ),
+    )
+
+    mass_ballast = res["mass_ballast"].reshape(5, n)
+    thickness_suit = res["thickness_suit"].reshape(5, n)
+
+    def get_proposal(x):
+        mean = x[1:].mean(axis=0)
+        return mean, np.sqrt((mean - x[1]) ** 2 + (mean - x[3]) ** 2)
+
+    mass_ballast_mean, mass_ballast_err = get_proposal(mass_ballast)
+    thickness_suit_mean, thickness_suit_err = get_proposal(thickness_suit)
+
+    # Performance gain, the proposal errors are propagated at first order
+    work_proposal, gradient, _ = get_total_work_derivatives(
+        df.depth_max.values,
+        df.mass_body.values,
+        mass_ballast_mean,
+        volume_tissues,
+        thickness_suit_mean * 2 / 1000,
+        df.volume_lungs.values,
+        df.speed_descent.values,
+        df.speed_ascent.values,
+        drag_coefficient,
+    )
+    work_proposal_err = np.sqrt(
+        (gradient[0] * mass_ballast_err) ** 2 + (gradient[1] * 2 / 1000 * thickness_suit_err) ** 2
+    )
+    work = df.total_work.values
+
+    return pd.DataFrame(
+        {
+            "surname": df.surname.values,
+            "work": work,
+            "work_best": work_proposal,
+            "mass_ballast_best": mass_ballast[0],
+            "mass_ballast_proposal": unumpy.uarray(mass_ballast_mean, mass_ballast_err),
+            "thickness_suit_best": thickness_suit[0],
+            "thickness_suit_proposal": unumpy.uarray(thickness_suit_mean, thickness_suit_err),
+            "gain": unumpy.uarray(work_proposal / work - 1, work_proposal_err / work) * 100,
+            "nfev": res["nfev"].reshape(5, n).sum(axis=0),
+        }
+    )
+
+
+def minimize_records(records, kwargs=None):
+    """Minimize serially the gear of a list of divers data"""
+    return [Diver(record).minimize(verbose=False, **(kwargs or {})) for record in records]
+
+
+def minimize(df=None, workers=1, chunksize=None, batch=False, **kwargs):
+    """Gear minimization of a population of divers
+
+    df : divers data (get_data() by default)
+    workers : number of processes (1 to run serially, None to use all the cores)
+    chunksize : number of divers sent at once to a process
+    batch : if True, solve all the divers at once with minimize_population
+    kwargs : parameters of Diver.minimize
+    """
+    df = estimate(get_data() if df is None else df, errors=batch)
+    records = [] if batch else [df.loc[i].to_dict() for i in df.index]
+
+    if batch:
+        minimization = minimize_population(df)
+    elif workers == 1 or len(records) <= 1:
+        minimization = minimize_records(records, kwargs)
+    else:
+        workers = min(workers or os.cpu_count(), len(records))
+        chunksize = chunksize or -(-len(records) // (4 * workers))
+        chunks = [records[i : i + chunksize] for i in range(0, len(records), chunksize)]
+
+        # map keeps the order of the chunks
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            minimization = [m for ms in executor.map(minimize_records, chunks, [kwargs] * len(chunks)) for m in ms]
+
+    # Solutions are in the order of the divers (surnames may be duplicated)
+    minimization = pd.DataFrame(minimization).drop(columns="surname")
+    minimization.index = df.index
+
+    return df.join(minimization)
+
+
+def split_errors(df, columns=("mass_ballast_proposal", "thickness_suit_proposal", "gain")):
+    """Replace the ufloat columns by their nominal values and add the {column}_error columns"""
+    for c in columns:
+        df[f"{c}_error"] = [v.s for v in df[c]]
+        df[c] = [v.n for v in df[c]]
+    return df
+
+
+class DiverArray:
+    """Population of divers stored as numpy columns (struct of arrays)
+
+    divers = DiverArray(get_data())
+    divers[3] is a lightweight view with the Diver attributes and methods
+    """
+
+    fields = [
+        "depth_max",
+        "mass_body",
+        "mass_ballast",
+        "thickness_suit",
+        "volume_lungs",
+        "time_descent",
+        "time_ascent",
+        "speed_descent",
+        "speed_ascent",
+        "depth_gliding_descent",
+        "depth_gliding_descent_error",
+        "depth_gliding_ascent",
+        "depth_gliding_ascent_error",
+        "volume_suit",
+        "volume_tissues",
+        "volume_tissues_error",
+        "drag_coefficient",
+        "drag_coefficient_error",
+        "total_work",
+    ]
+
+    def __init__(self, df=None, surname=None, columns=None) -> None:
+        """
+        df : divers data, as get_data() (the estimations are added if they are missing)
+        surname, columns : arrays of the surnames and of the fields (instead of df)
+        """
+        if df is not None:
+            if any(f not in df for f in DiverArray.fields):
+                df = estimate(df.copy(), errors=True)
+            surname = df["surname"].to_numpy(dtype=object)
+            columns = {f: df[f].to_numpy(dtype=float) for f in DiverArray.fields}
+
+        self.surname, self.columns = surname, columns
+
+    def __len__(self) -> int:
+        return len(self.surname)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return DiverView(self, index)
+
+        # Slice, mask or list of positions
+        return DiverArray(surname=self.surname[index], columns={f: v[index] for f, v in self.columns.items()})
+
+    def __iter__(self):
+        return (DiverView(self, i) for i in range(len(self)))
+
+    def __getattr__(self, name):
+        if name in DiverArray.fields:
+            return self.columns[name]
+        raise AttributeError(f"'DiverArray' object has no attribute '{name}'")
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(surname=self.surname, **self.columns))
+
+    def minimize(self) -> pd.DataFrame:
+        """Gear minimization of all the divers as one batched problem (see minimize_population)"""
+        return minimize_population(self.to_frame())
+
+
+class DiverView:
+    """One diver of a DiverArray, with the Diver attributes read from the array columns"""
+
+    __slots__ = ("divers", "index")
+
+    def __init__(self, divers: DiverArray, index: int) -> None:
+        self.divers, self.index = divers, index
+
+    @property
+    def surname(self):
+        return self.divers.surname[self.index]
+
+    @property
+    def data(self) -> dict:
+        return dict(surname=self.surname, **{f: float(v[self.index]) for f, v in self.divers.columns.items()})
+
+    def to_diver(self) -> Diver:
+        return Diver(self.data)
+
+    def minimize(self, **kwargs):
+        return self.to_diver().minimize(**kwargs)
+
+    def minimize_montecarlo(self, **kwargs):
+        return self.to_diver().minimize_montecarlo(**kwargs)
+
+    def get_total_work(self, variable=None, **grids):
+        return self.to_diver().get_total_work(variable, **grids)
+
+
+def get_field(field):
+    return property(lambda view: view.divers.columns[field][view.index].item())
+
+
+def get_uncertain_field(field):
+    return property(
+        lambda view: unc.ufloat(
+            view.divers.columns[field][view.index].item(), view.divers.columns[f"{field}_error"][view.index].item()
+        )
+    )
+
+
+for field in DiverArray.fields:
+    setattr(DiverView, field, get_field(field))
+
+# Same uncertain attributes as Diver
+for field in ["depth_gliding_descent", "depth_gliding_ascent", "volume_tissues", "drag_coefficient"]:
+    setattr(DiverView, field, get_uncertain_field(field))
@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+
+from . import divers
+
+
+# Inputs of the estimations, a change of one of them triggers a new computation
+input_columns = [
+    "surname",
+    "depth_max",
+    "time_descent",
+    "time_ascent",
+    "depth_gliding_descent",
+    "depth_gliding_descent_error",
+    "depth_gliding_ascent",
+    "depth_gliding_ascent_error",
+    "volume_lungs",
+    "mass_body",
+    "mass_ballast",
+    "thickness_suit",
+]
+
+
+def get_input_hash(df) -> pd.Series:
+    return pd.util.hash_pandas_object(df[input_columns].astype(str), index=False).map("{:016x}".format)
+
+
+def read_results(filename):
+    """Results store (CSV or parquet file), None if it does not exist yet"""
+    if not os.path.exists(filename):
+        return None
+
+    if filename.endswith(".parquet"):
+        return pd.read_parquet(filename)
+
+    return pd.read_csv(filename, dtype={"timestamp": "string", "surname": "string", "input_hash": "string"})
+
+
+def write_results(df, filename, append=False) -> None:
+    if filename.endswith(".parquet"):
+        df.to_parquet(filename, index=False)
+    else:
+        df.to_csv(filename, index=False, mode="a" if append else "w", header=not append)
+
+
+def get_last_timestamp(results):
+    """Timestamp of the last processed form submission"""
+    if results is None:
+        return None
+    return pd.to_datetime(results["timestamp"], errors="coerce").max()
+
+
+def update(filename="freediving_results.csv", df=None, verbose=True, **kwargs):
+    """Estimate and minimize the new or changed divers only, and append them to the results store
+
+    filename : results store (CSV or parquet file)
+    df : divers data with the timestamp column (get_data(timestamp=True) by default)
+    kwargs : parameters of divers.minimize (workers, batch, ...)
+
+    return the rows which have been processed
+    """
+    df = divers.get_data(timestamp=True) if df is None else df.copy()
+    df["input_hash"] = get_input_hash(df)
+
+    results = read_results(filename)
+    last_timestamp = get_last_timestamp(results)
+
+    # Submissions are identified by their timestamp and surname
+    key = df["timestamp"].astype(str) + "/" + df["surname"].astype(str)
+    if results is None:
+        todo = pd.Series(True, index=df.index)
+        is_changed = pd.Series(False, index=df.index)
+    else:
+        results_key = results["timestamp"].astype(str) + "/" + results["surname"].astype(str)
+        todo = ~df["input_hash"].isin(set(results["input_hash"]))
+        is_changed = todo & key.isin(set(results_key))
+
+    df = df[todo]
+    if verbose and last_timestamp is not None:
+        is_new = pd.to_datetime(df["timestamp"], errors="coerce") > last_timestamp
+        print(f"{is_new.sum()} new submissions since {last_timestamp}, {len(df)} divers to process")
+
+    if df.empty:
+        return df
+
+    df = divers.split_errors(divers.minimize(df, **kwargs))
+    df["processed_at"] = pd.Timestamp.now().isoformat()
+
+    if results is None or filename.endswith(".parquet") or is_changed.any():
+        # Changed submissions replace their previous results
+        if results is not None:
+            results = results[~results_key.isin(set(key[is_changed]))]
+        write_results(pd.concat([results, df]) if results is not None else df, filename)
+    else:
+        write_results(df.reindex(columns=results.columns), filename, append=True)
+
+    return df
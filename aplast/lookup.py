@@ -0,0 +1,165 @@
+import json
+import math
+import itertools
+
+import numpy as np
+import pandas as pd
+import uncertainties as unc
+
+from . import divers
+from .diver import Diver, get_seconds
+
+
+# Diver of the app with the default inputs (volume_lungs in m3, times in seconds)
+default_inputs = dict(
+    depth_max=100,
+    time_descent=180,
+    time_ascent=180,
+    depth_gliding_descent=20,
+    depth_gliding_descent_error=5,
+    depth_gliding_ascent=10,
+    depth_gliding_ascent_error=5,
+    volume_lungs=0.006,
+    mass_body=70,
+    mass_ballast=1,
+    thickness_suit=1.5,
+)
+
+
+class LookupTable:
+    """Precomputed Diver.minimize results on a grid of inputs, queried by multilinear interpolation
+
+    table = LookupTable.build(grid={"depth_max": np.arange(40, 131, 10), "mass_body": np.arange(40, 121, 10)})
+    table.save("recommendations.npz")
+    LookupTable.load("recommendations.npz").query(data)
+    """
+
+    outputs = [
+        "work",
+        "work_best",
+        "mass_ballast_best",
+        "mass_ballast_proposal",
+        "mass_ballast_proposal_error",
+        "thickness_suit_best",
+        "thickness_suit_proposal",
+        "thickness_suit_proposal_error",
+        "gain",
+        "gain_error",
+    ]
+
+    # Maximal spread of an output between the corners of the interpolation cell
+    tolerance = {"mass_ballast_best": 0.5, "thickness_suit_best": 0.5}
+
+    def __init__(self, axes: dict, values: np.ndarray, fixed: dict, tolerance=None) -> None:
+        """
+        axes : sorted grid values of each gridded input
+        values : outputs on the grid, shape (len(outputs), *grid shape)
+        fixed : value of the inputs which are not gridded
+        """
+        self.axes = {k: np.asarray(v, dtype=float) for k, v in axes.items()}
+        self.values, self.fixed = values, fixed
+        self.tolerance = LookupTable.tolerance if tolerance is None else tolerance
+
+    @classmethod
+    def build(cls, grid: dict, fixed=None, **kwargs):
+        """Run the minimization on all the points of the grid
+
+        grid : values of the gridded inputs (times in seconds, volume_lungs in m3)
+        fixed : value of the other inputs (default_inputs by default)
+        kwargs : parameters of divers.minimize (workers, batch, ...)
+        """
+        fixed = {k: v for k, v in dict(default_inputs, **(fixed or {})).items() if k not in grid}
+        axes = {k: np.sort(np.asarray(v, dtype=float)) for k, v in grid.items()}
+
+        df = pd.DataFrame(list(itertools.product(*axes.values())), columns=list(axes.keys()))
+        for k, v in fixed.items():
+            df[k] = v
+        df["surname"] = [f"grid_{i}" for i in df.index]
+        df["volume_suit"] = 2 * df["thickness_suit"] / 1000.0
+        df["speed_descent"] = df["depth_max"] / df["time_descent"]
+        df["speed_ascent"] = df["depth_max"] / df["time_ascent"]
+
+        df = divers.split_errors(divers.minimize(df, **kwargs))
+
+        shape = [len(v) for v in axes.values()]
+        values = np.stack([df[c].values.astype(float).reshape(shape) for c in cls.outputs])
+        return cls(axes, values, fixed)
+
+    def save(self, filename) -> None:
+        np.savez_compressed(
+            filename,
+            names=np.array(list(self.axes.keys())),
+            values=self.values,
+            fixed=np.array(json.dumps(self.fixed)),
+            **{f"axis_{k}": v for k, v in self.axes.items()},
+        )
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as table:
+            axes = {k: table[f"axis_{k}"] for k in table["names"]}
+            return cls(axes, table["values"], json.loads(str(table["fixed"])))
+
+    def get_inputs(self, data: dict) -> dict:
+        inputs = dict(data)
+        for c in ["time_descent", "time_ascent"]:
+            if c in inputs:
+                inputs[c] = get_seconds(inputs[c])
+        return inputs
+
+    def interpolate(self, data: dict):
+        """Interpolated outputs, None if data is outside the grid or if the interpolation is not accurate enough"""
+        inputs = self.get_inputs(data)
+
+        for k, v in self.fixed.items():
+            if k not in inputs or not math.isclose(inputs[k], v, abs_tol=1e-9):
+                return None
+
+        # Interpolation cell and weights of its corners
+        cell, weights = [], np.ones([1] * len(self.axes))
+        for d, (k, axis) in enumerate(self.axes.items()):
+            x = inputs[k]
+            if len(axis) == 1:
+                if not math.isclose(x, axis[0], abs_tol=1e-9):
+                    return None
+                cell.append(slice(0, 1))
+                continue
+
+            if x < axis[0] or x > axis[-1]:
+                return None
+
+            i = min(np.searchsorted(axis, x, side="right") - 1, len(axis) - 2)
+            t = (x - axis[i]) / (axis[i + 1] - axis[i])
+            cell.append(slice(i, i + 2))
+            weights = weights * np.array([1 - t, t]).reshape([-1 if j == d else 1 for j in range(len(self.axes))])
+
+        corners = self.values[(slice(None),) + tuple(cell)]
+        corners = corners.reshape(len(self.outputs), -1)
+        weights = np.broadcast_to(weights, self.values[(0,) + tuple(cell)].shape).ravel()
+
+        for k, tolerance in self.tolerance.items():
+            c = corners[self.outputs.index(k)]
+            if c.max() - c.min() > tolerance:
+                return None
+
+        return dict(zip(self.outputs, corners @ weights))
+
+    def query(self, data: dict) -> dict:
+        """Same result as Diver(data).minimize(), from the table when possible"""
+        values = self.interpolate(data)
+        if values is None:
+            return dict(Diver(data).minimize(verbose=False), source="optimizer")
+
+        return {
+            "surname": data.get("surname"),
+            "work": values["work"],
+            "work_best": values["work_best"],
+            "mass_ballast_best": values["mass_ballast_best"],
+            "mass_ballast_proposal": unc.ufloat(values["mass_ballast_proposal"], values["mass_ballast_proposal_error"]),
+            "thickness_suit_best": values["thickness_suit_best"],
+            "thickness_suit_proposal": unc.ufloat(
+                values["thickness_suit_proposal"], values["thickness_suit_proposal_error"]
+            ),
+            "gain": unc.ufloat(values["gain"], values["gain_error"]),
+            "source": "table",
+        }
@@ -0,0 +1,72 @@
+import json
+import time
+import numbers
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def get_key(data: dict) -> str:
+    """Canonical hash of a dictionary of inputs (independent of the keys order and of the numeric types)"""
+
+    def normalize(value):
+        # Numbers (python or numpy, int or float) are converted to floats so that 1 and 1.0 have the same key
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, (bool, np.bool_)):
+            return bool(value)
+        if isinstance(value, numbers.Real):
+            return float(value)
+        return value
+
+    def default(value):
+        # Other objects (time, ufloat, ...) are converted to strings
+        return str(value)
+
+    return hashlib.sha1(json.dumps(normalize(data), sort_keys=True, default=default).encode()).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe cache with a bounded size (least recently used entries are dropped first)
+    and an optional time to live in seconds"""
+
+    def __init__(self, maxsize=128, ttl=None) -> None:
+        self.maxsize, self.ttl = maxsize, ttl
+        self.entries = OrderedDict()
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                timestamp, value = self.entries[key]
+                if self.ttl is None or time.monotonic() - timestamp < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value) -> None:
+        if not self.maxsize:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits, self.misses = 0, 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,96 @@
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# Reports being collected by the current thread (a Streamlit session runs in its own thread)
+local = threading.local()
+
+
+class Report:
+    """Calls, time and function evaluations of the instrumented functions, by name"""
+
+    def __init__(self) -> None:
+        self.stats = {}
+
+    def add(self, name, elapsed, nfev=0) -> None:
+        calls, total, total_nfev = self.stats.get(name, (0, 0.0, 0))
+        self.stats[name] = (calls + 1, total + elapsed, total_nfev + nfev)
+
+    def to_frame(self):
+        import pandas as pd
+
+        df = pd.DataFrame(
+            [(name, calls, total, 1000 * total / calls, nfev) for name, (calls, total, nfev) in self.stats.items()],
+            columns=["name", "calls", "total (s)", "mean (ms)", "nfev"],
+        )
+        return df.set_index("name").sort_values("total (s)", ascending=False)
+
+    def __str__(self) -> str:
+        lines = [f"{'name':<40}{'calls':>8}{'total (s)':>12}{'mean (ms)':>12}{'nfev':>8}"]
+        for name, (calls, total, nfev) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<40}{calls:>8}{total:>12.4f}{1000 * total / calls:>12.4f}{nfev:>8}")
+        return "\n".join(lines)
+
+
+def get_reports() -> list:
+    return getattr(local, "reports", None)
+
+
+@contextmanager
+def report():
+    """Collect the timings of the instrumented functions called in the block (instrumentation is off otherwise)
+
+    with aplast.profiling.report() as r:
+        aplast.Diver(data).minimize()
+    print(r)
+    """
+    reports = local.__dict__.setdefault("reports", [])
+    r = Report()
+    reports.append(r)
+    try:
+        yield r
+    finally:
+        reports.remove(r)
+
+
+@contextmanager
+def timer(name):
+    """Time a block, the number of function evaluations can be set in the yielded dict (stats["nfev"])"""
+    stats = {"nfev": 0}
+    reports = get_reports()
+    if not reports:
+        yield stats
+        return
+
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        elapsed = time.perf_counter() - start
+        for r in reports:
+            r.add(name, elapsed, stats["nfev"])
+
+
+def instrument(func=None, name=None):
+    """Decorator timing and counting the calls of a function when a report is being collected"""
+    if func is None:
+        return functools.partial(instrument, name=name)
+
+    name = func.__qualname__ if name is None else name
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        reports = get_reports()
+        if not reports:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for r in reports:
+                r.add(name, elapsed)
+
+    return wrapper
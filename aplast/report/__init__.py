@@ -0,0 +1 @@
+"""Headless batch processing of the divers database (aplast-run entry point)"""
@@ -0,0 +1,111 @@
+"""Batch recomputation of the gear recommendations of the divers database
+
+aplast-run --output freediving_results.parquet --workers 4
+aplast-run --input export.csv --chunksize 10000 --batch
+aplast-run --incremental --batch
+"""
+
+import sys
+import json
+import time
+import argparse
+
+from .. import divers, incremental, profiling
+from ..diver import Diver
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="aplast-run", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--input", help=f"Divers database, form export CSV ({Diver.database_filename} by default)")
+    parser.add_argument("--output", default="freediving_results.csv", help="Results file (.csv or .parquet)")
+    parser.add_argument("--query", help="pandas query selecting the divers")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes (0 to use all the cores)")
+    parser.add_argument("--batch", action="store_true", help="Solve all the divers at once (vectorized Newton)")
+    parser.add_argument("--method", help="Diver.minimize method (L-BFGS-B by default, reduced, ...)")
+    parser.add_argument("--jac", action="store_true", help="Use the closed-form gradient in Diver.minimize")
+
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--chunksize", type=int, help="Process the database chunk by chunk (CSV output only)")
+    mode.add_argument("--incremental", action="store_true", help="Only process the new or changed submissions")
+
+    parser.add_argument("--timings", help="Also write the timing summary in this JSON file")
+    return parser
+
+
+def run(args) -> int:
+    """Process the divers following the command line arguments
+
+    return the number of divers processed
+    """
+    kwargs = dict(workers=args.workers or None, batch=args.batch)
+    if args.method:
+        kwargs["method"] = args.method
+    if args.jac:
+        kwargs["jac"] = True
+
+    if args.chunksize:
+        with profiling.timer("divers.stream_to_csv"):
+            return divers.stream_to_csv(
+                args.output, chunksize=args.chunksize, query=args.query, optimize=True, **kwargs
+            )
+
+    if args.incremental:
+        df = divers.get_data(query=args.query, timestamp=True)
+        with profiling.timer("incremental.update"):
+            return len(incremental.update(args.output, df=df, **kwargs))
+
+    df = divers.get_data(query=args.query)
+    with profiling.timer("divers.minimize"):
+        df = divers.split_errors(divers.minimize(df, **kwargs))
+    with profiling.timer("write_results"):
+        incremental.write_results(df, args.output)
+    return len(df)
+
+
+def main(argv=None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.chunksize and args.output.endswith(".parquet"):
+        parser.error("--chunksize only writes CSV files")
+    if args.batch and (args.method or args.jac or args.workers != 1):
+        parser.error("--batch solves all the divers at once, it can not be used with --method, --jac or --workers")
+
+    database_filename = Diver.database_filename
+    if args.input:
+        Diver.database_filename = args.input
+
+    start = time.perf_counter()
+    try:
+        with profiling.report() as report:
+            size = run(args)
+    finally:
+        Diver.database_filename = database_filename
+    elapsed = time.perf_counter() - start
+
+    print(report)
+    print(f"{size} divers processed in {elapsed:.2f} s ({size / elapsed:.1f} divers/s) => {args.output}")
+
+    if args.timings:
+        with open(args.timings, "w") as f:
+            json.dump(
+                {
+                    "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "arguments": vars(args),
+                    "divers": size,
+                    "elapsed": elapsed,
+                    "stats": {
+                        name: {"calls": calls, "total": total, "nfev": nfev}
+                        for name, (calls, total, nfev) in report.stats.items()
+                    },
+                },
+                f,
+                indent=2,
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
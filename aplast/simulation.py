@@ -0,0 +1,114 @@
+import numpy as np
+
+from .constants import *
+from .diver import get_forces
+
+
+def simulate(
+    depth_max,
+    mass_body,
+    mass_ballast,
+    volume_incompress,
+    volume_suit,
+    volume_gas,
+    speed_descent,
+    speed_ascent,
+    drag_coefficient,
+    dt=0.2,
+    duration=None,
+    tau=1.0,
+):
+    """Time-resolved dive of a batch of divers (inputs are broadcast together as in get_total_work_batch)
+
+    The depth z (positive downwards) and the velocity v follow
+    m dv/dt = force_weight - force_archimede1 - force_archimede2 pressure_0 / P(z) - drag_coefficient v |v| + s thrust
+    where the gas of the lungs and of the suit is compressed with the pressure P(z), and s is 1 during the descent
+    and -1 during the ascent. The diver turns back at depth_max and stops at the surface.
+    The thrust keeps the speed of the phase (speed_descent or speed_ascent), with a relaxation time tau,
+    and is never negative: the diver glides when the buoyancy is enough.
+
+    dt : time step in seconds of the semi-implicit Euler integrator
+    duration : maximum simulated time in seconds (1.5 times the dive at the target speeds by default),
+    the simulation stops when all the divers are back at the surface
+
+    return dict of time (T,), depth, velocity, power (T, *shape) arrays, power being thrust * |velocity|
+    """
+    inputs = np.broadcast_arrays(
+        *[
+            np.asarray(v, dtype=float)
+            for v in [
+                depth_max,
+                mass_body,
+                mass_ballast,
+                volume_incompress,
+                volume_suit,
+                volume_gas,
+                speed_descent,
+                speed_ascent,
+                drag_coefficient,
+            ]
+        ]
+    )
+    shape = inputs[0].shape
+    depth_max, mass_body, mass_ballast, volume_incompress, volume_suit, volume_gas, speed_descent, speed_ascent, drag_coefficient = [
+        v.ravel() for v in inputs
+    ]
+
+    force_weight, force_archimede1, force_archimede2, _, _ = get_forces(
+        mass_body, mass_ballast, volume_incompress, volume_suit, volume_gas, speed_descent, speed_ascent, drag_coefficient
+    )
+    mass = force_weight / g
+
+    if duration is None:
+        duration = 1.5 * np.max(depth_max / speed_descent + depth_max / speed_ascent, initial=0)
+    steps = int(np.ceil(duration / dt)) + 1
+
+    depth = np.zeros((steps, depth_max.size))
+    velocity = np.zeros((steps, depth_max.size))
+    power = np.zeros((steps, depth_max.size))
+
+    z, v = np.zeros(depth_max.size), np.zeros(depth_max.size)
+    direction = np.ones(depth_max.size)
+    surfaced = np.zeros(depth_max.size, dtype=bool)
+
+    # Constant terms of the forces, gas volumes are proportional to 1 / (1 + depth / depth_pressure)
+    depth_pressure = pressure_0 / (g * r_water)
+    force_surface = force_weight - force_archimede1
+    thrust_descent = drag_coefficient * speed_descent**2
+    thrust_ascent = drag_coefficient * speed_ascent**2
+
+    for i in range(1, steps):
+        # Net force of the weight and of the buoyancy, the gas volume follows the pressure
+        force_static = force_surface - force_archimede2 / (1 + z / depth_pressure)
+        descent = direction > 0
+
+        # Thrust holding the target speed, in the direction of the motion
+        thrust = np.where(descent, thrust_descent - force_static, thrust_ascent + force_static)
+        thrust += mass * (np.where(descent, speed_descent - v, speed_ascent + v)) / tau
+        thrust = np.where(surfaced, 0, np.maximum(thrust, 0))
+
+        v = v + dt * (force_static - drag_coefficient * v * np.abs(v) + direction * thrust) / mass
+        z = z + dt * v
+
+        # Turn back at the bottom, stop at the surface
+        bottom = descent & (z >= depth_max)
+        z = np.where(bottom, depth_max, z)
+        v = np.where(bottom, 0, v)
+        direction = np.where(bottom, -1.0, direction)
+
+        surfaced |= ~descent & (z <= 0)
+        z = np.where(surfaced, 0, z)
+        v = np.where(surfaced, 0, v)
+
+        depth[i], velocity[i], power[i] = z, v, thrust * np.abs(v)
+
+        if surfaced.all():
+            steps = i + 1
+            break
+
+    return {
+        "time": dt * np.arange(steps),
+        "depth": depth[:steps].reshape((steps,) + shape),
+        "velocity": velocity[:steps].reshape((steps,) + shape),
+        "power": power[:steps].reshape((steps,) + shape),
+    }
@@ -1,11 +1,19 @@
+import io
+
 import numpy as np
 import pandas as pd
-import scipy as sp
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.image import imread
 from matplotlib.patches import Circle
 from matplotlib.patheffects import withStroke
 
 from . import constants
+from .memoize import LRUCache
+from .profiling import instrument
+
+# Rotated diver icons, and rendered figures (or their encoded bytes) by trajectory characteristics
+icons_cache = LRUCache(maxsize=8)
+figures_cache = LRUCache(maxsize=64)
 
 
 def get_trajectory(time_descent, time_ascent, max_depth) -> pd.Series:
@@ -20,58 +28,162 @@ def get_trajectory(time_descent, time_ascent, max_depth) -> pd.Series:
     return pd.Series(y3, index=x3)
 
 
-def show_dynamic(diver):
+@instrument(name="trajectory.show_dynamic")
+def show_dynamic(diver, frames=60, points=500, max_bytes=250_000, simulated=False, duration=5.0):
+    """Animated position-time figure of the dive (plotly), memoized as show
+
+    frames : maximum number of animation frames, evenly spaced in time
+    points : maximum number of points of the trajectory trace
+    max_bytes : cap of the JSON payload, the number of frames (then of points) is halved until the figure fits
+    simulated : if True, trajectory of Diver.simulate instead of the constant speeds one
+    duration : duration of the animation in seconds
+    """
+    key = (
+        "dynamic",
+        diver.data_key if simulated else float(diver.depth_max),
+        float(diver.time_descent),
+        float(diver.time_ascent),
+        float(diver.depth_gliding_descent.n),
+        float(diver.depth_gliding_ascent.n),
+        frames,
+        points,
+        max_bytes,
+        simulated,
+        duration,
+    )
+    fig = figures_cache.get(key)
+    if fig is not None:
+        return fig
+
+    if simulated:
+        simulation = diver.simulate()
+        x, y = simulation["time"], -simulation["depth"]
+    else:
+        track = get_trajectory(diver.time_descent, diver.time_ascent, diver.depth_max)
+        x, y = track.index.values.astype(float), track.values
+
+    # Beginning and end of the gliding phase
+    glides = [
+        x[np.argmax(-y >= diver.depth_gliding_descent.n)],
+        x[len(y) - 1 - np.argmax(-y[::-1] >= diver.depth_gliding_ascent.n)],
+    ]
+    glides = (glides, [float(np.interp(t, x, y)) for t in glides])
+
+    # Fewer frames, then fewer points of the trajectory, until the figure fits
+    while True:
+        fig = get_dynamic_figure(x, y, glides, frames, points, duration)
+        if len(fig.to_json()) <= max_bytes or points <= 2:
+            break
+        if frames > 2:
+            frames //= 2
+        else:
+            points //= 2
+
+    figures_cache.set(key, fig)
+    return fig
 
-    import plotly.graph_objects as go
-    import numpy as np
 
-    x = np.concatenate([np.linspace(0, 90, 90), np.linspace(90, 170, 80)], axis=0)
-    y = -125 * np.concatenate([np.linspace(0, 1, 100), np.linspace(1, 0, 80)], axis=0)
+def get_dynamic_figure(x, y, glides, frames, points, duration):
+    import plotly.graph_objects as go
 
-    xx = x  # [::2]
-    yy = y  # [::2]
-    N = len(xx)
+    # Static traces are only sent once, the frames only move the marker of the diver (trace 2)
+    line = np.unique(np.append(np.linspace(0, len(x) - 1, min(points, len(x))).round().astype(int), len(x) - 1))
+    samples = np.unique(np.linspace(0, len(x) - 1, min(frames, len(x))).round().astype(int))
+    x, y = np.round(x, 2), np.round(y, 2)
 
-    # Create figure
-    fig = go.Figure(
+    return go.Figure(
         data=[
-            go.Scatter(x=x, y=y, mode="lines", line=dict(width=2, color="blue"), name="Diver"),
-            go.Scatter(x=x, y=y, mode="lines", line=dict(width=2, color="blue"), name="Trajectory"),
+            go.Scatter(x=x[line], y=y[line], mode="lines", line=dict(width=2, color="blue"), name="Trajectory"),
+            go.Scatter(
+                x=np.round(glides[0], 2), y=np.round(glides[1], 2), mode="markers", marker=dict(color="royalblue", size=12), name="Equilibrium"
+            ),
+            go.Scatter(x=x[:1], y=y[:1], mode="markers", marker=dict(color="red", size=20), name="Diver"),
         ],
         layout=go.Layout(
-            xaxis=dict(range=[-1, 175], autorange=False, zeroline=False),
-            yaxis=dict(range=[-130, 1], autorange=False, zeroline=False),
+            xaxis=dict(range=[-1, 1.02 * x.max() + 1], autorange=False, zeroline=False, title="Time in seconds"),
+            yaxis=dict(range=[1.05 * y.min() - 1, 1], autorange=False, zeroline=False, title="Depth in meters"),
             hovermode="closest",
-            updatemenus=[dict(type="buttons", buttons=[dict(label="Play", method="animate", args=[None])])],
+            updatemenus=[
+                dict(
+                    type="buttons",
+                    buttons=[
+                        dict(
+                            label="Play",
+                            method="animate",
+                            args=[
+                                None,
+                                dict(
+                                    frame=dict(duration=1000 * duration / len(samples), redraw=False),
+                                    transition=dict(duration=0),
+                                    fromcurrent=True,
+                                ),
+                            ],
+                        )
+                    ],
+                )
+            ],
         ),
-        frames=[
-            go.Frame(data=[go.Scatter(x=[xx[k]], y=[yy[k]], mode="markers", marker=dict(color="red", size=20))])
-            for k in range(N)
-        ],
+        frames=[go.Frame(data=[go.Scatter(x=[x[k]], y=[y[k]])], traces=[2], name=str(k)) for k in samples],
     )
-    return fig
 
 
-def show(diver):
+def get_icons(angles=(50, 130)):
+    """Diver icons rotated by the angles (in degrees), None if the image is not found"""
+    icons = icons_cache.get(angles)
+    if icons is None:
+        from scipy import ndimage
+
+        filename = constants.get_file("diver.png")
+        # The spline interpolation of the rotation overshoots the [0, 1] range of the colors
+        icons = [np.clip(ndimage.rotate(imread(filename), angle), 0, 1) for angle in angles] if filename else []
+        icons_cache.set(angles, icons)
 
+    return icons or None
+
+
+@instrument(name="trajectory.show")
+def show(diver, format=None):
+    """Position-time figure of the dive, memoized by the depth, the times and the gliding depths
+
+    format : None to return the matplotlib figure, or "png"/"svg" to return the encoded bytes
+    """
+    key = (
+        float(diver.depth_max),
+        float(diver.time_descent),
+        float(diver.time_ascent),
+        float(diver.depth_gliding_descent.n),
+        float(diver.depth_gliding_ascent.n),
+        format,
+    )
+    figure = figures_cache.get(key)
+    if figure is None:
+        figure = get_figure(*key[:5])
+        if format is not None:
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format=format, bbox_inches="tight")
+            figure = buffer.getvalue()
+        figures_cache.set(key, figure)
+
+    return figure
+
+
+def get_figure(depth_max, time_descent, time_ascent, depth_gliding_descent, depth_gliding_ascent):
     royal_blue = [0, 20 / 256, 82 / 256]
 
-    fig, ax = plt.subplots(figsize=(15, 5))
+    # Figure outside of pyplot, which does not keep a reference of the memoized figures
+    fig = Figure(figsize=(15, 5))
+    ax = fig.subplots()
     ax.tick_params(which="major", width=1.0, length=10, labelsize=14)
     ax.tick_params(which="minor", width=1.0, length=5, labelsize=10, labelcolor="0.25")
 
     ax.grid(linestyle="--", linewidth=0.5, color=".25", zorder=-10)
 
-    depth_max = diver.depth_max  # in m
-    time_descent = diver.time_descent  # in sec
-    time_ascent = diver.time_ascent  # in sec
-
     track = get_trajectory(time_descent, time_ascent, depth_max)
 
-    ydee = diver.depth_gliding_descent.n
+    ydee = depth_gliding_descent
     xdee = track[track + ydee < 0].index[0]
 
-    yaee = diver.depth_gliding_ascent.n
+    yaee = depth_gliding_ascent
     xaee = track[track + yaee < 0].index[-1]
 
     track1 = np.ma.masked_where(track.index <= xdee, track)
@@ -109,15 +221,15 @@ def show(diver):
     annotate(xdee, -ydee, "Equilibrium")
     annotate(xaee, -yaee, "Equilibrium")
 
-    filename = constants.get_file("diver.png")
+    icons = get_icons()
 
-    if filename:
+    if icons:
         newax = fig.add_axes([0.3, 0.33, 0.15, 0.15], anchor="NE")
-        newax.imshow(sp.ndimage.rotate(plt.imread(filename), 50))
+        newax.imshow(icons[0])
         newax.axis("off")
 
         newax = fig.add_axes([0.6, 0.33, 0.15, 0.15], anchor="NE")
-        newax.imshow(sp.ndimage.rotate(plt.imread(filename), 130))
+        newax.imshow(icons[1])
         newax.axis("off")
 
-    # plt.show()
+    return fig
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def propagate(func, errors: dict, backend="numpy", **inputs):
+    """First-order propagation of independent errors through a formula
+
+    func : formula of the inputs (get_volume_tissues, get_drag_coefficient, ...)
+    errors : errors of some of the inputs, {name: sigma}
+    backend : "numpy" to carry values and errors as numpy arrays, the derivatives are exact
+    (complex step, func must only use arithmetic operations), or "uncertainties" to use ufloat objects
+    inputs : inputs of func (floats or arrays)
+
+    return value, error
+    """
+
+    if backend == "uncertainties":
+        from uncertainties import unumpy
+
+        uinputs = dict(inputs)
+        for k, sigma in errors.items():
+            uinputs[k] = unumpy.uarray(*np.broadcast_arrays(np.asarray(inputs[k], dtype=float), sigma))
+        value = func(**uinputs)
+        return unumpy.nominal_values(value), unumpy.std_devs(value)
+
+    if backend != "numpy":
+        raise ValueError(f"backend '{backend}' is unknown")
+
+    inputs = {k: np.asarray(v, dtype=float) for k, v in inputs.items()}
+    value = func(**inputs)
+
+    # Complex step derivative: f(x + ih) = f(x) + ih f'(x) + O(h**2), without cancellation error
+    step = 1e-20
+    variance = np.zeros(np.shape(value))
+    for k, sigma in errors.items():
+        derivative = func(**dict(inputs, **{k: inputs[k] + 1j * step})).imag / step
+        variance = variance + (derivative * sigma) ** 2
+
+    return value, np.sqrt(variance)
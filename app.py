@@ -7,6 +7,7 @@ import time
 import extra_streamlit_components as stx
 import os
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 
 
 import datetime
@@ -15,6 +16,7 @@ from aplast import strapp
 
 
 st.set_option("deprecation.showPyplotGlobalUse", False)
+aplast.set_style()
 
 
 @st.cache(allow_output_mutation=True, suppress_st_warning=True)
@@ -101,23 +103,81 @@ def main():
         depth_gliding_ascent_error=depth_gliding_ascent_error,
     )
 
+    # Consecutive inputs of a session only differ slightly, the last solution is a good initial guess
+    if "warm_starts" not in st.session_state:
+        st.session_state["warm_starts"] = aplast.diver.WarmStarts(maxsize=1)
+    if "background" not in st.session_state:
+        st.session_state["background"] = aplast.background.Background(get_executor())
+    background = st.session_state["background"]
+
     d = aplast.Diver(data)
-    solution = d.minimize()
-    time_total = d.time_descent + d.time_ascent
 
     with st.expander("Recommendations", expanded=True):
+        status = st.empty()
+        recommendations = st.empty()
+
+    with st.expander("Trajectory", expanded=True):
+        animation = st.checkbox("Animation")
+        trajectory = st.empty()
+
+    # The computations run in the background, the last result is shown until the new one arrives
+    key = (d.data_key, animation)
+    background.submit(key, get_results, d, st.session_state["warm_starts"], animation)
+
+    results = background.result(key)
+    if results is not None:
+        show_results(results, recommendations, trajectory)
+
+    if not background.done(key):
+        start = time.time()
+        results = background.wait(key, callback=lambda: status.caption(f"Computing... {time.time() - start:.1f} s"))
+        status.empty()
+        if results is not None:
+            show_results(results, recommendations, trajectory)
+
+    return results
+
+
+@st.cache(allow_output_mutation=True, suppress_st_warning=True)
+def get_executor():
+    # Shared by the sessions
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def get_results(d, warm_starts, animation=False):
+    """Gear recommendations and trajectory figures (run in the background executor)
+
+    The diver and the timings (reports are collected by thread) are returned with the results
+    """
+    with aplast.profiling.report() as report:
+        return {
+            "diver": d,
+            "solution": warm_starts.minimize(d, verbose=False),
+            # Encoded once for each trajectory, and memoized across reruns
+            "trajectory": aplast.trajectory.show(d, format="png"),
+            "animation": aplast.trajectory.show_dynamic(d) if animation else None,
+            "report": report,
+        }
+
+
+def show_results(results, recommendations, trajectory):
+    # The last results can be shown while the new ones are computed, the deltas are those of their diver
+    d, solution = results["diver"], results["solution"]
+    time_total = d.time_descent + d.time_ascent
+
+    with recommendations.container():
         col3, col4, col5, col6 = st.columns(4)
         with col3:
             st.metric(
                 "mass_ballast_best",
                 "%s kg" % solution["mass_ballast_best"],
-                "%s kg" % (solution["mass_ballast_best"] - mass_ballast),
+                "%s kg" % (solution["mass_ballast_best"] - d.mass_ballast),
             )
         with col4:
             st.metric(
                 "thickness_suit_best",
                 "%.2f mm" % solution["thickness_suit_best"],
-                "%.2f mm" % (solution["thickness_suit_best"] - thickness_suit),
+                "%.2f mm" % (solution["thickness_suit_best"] - d.thickness_suit),
             )
         with col5:
             st.metric(
@@ -138,22 +198,18 @@ def main():
             )
     # st.write("solution", solution)
 
-    with st.expander("Trajectory", expanded=True):
-        diver = d.data
-        diver.update(
-            {
-                "mass_ballast": solution["mass_ballast_best"],
-                "thickness_suit": solution["thickness_suit_best"],
-            }
-        )
-        d_best = aplast.Diver(data=diver)
-
-        # st.plotly_chart(aplast.trajectory.show_dynamic(d))
-        p = aplast.trajectory.show(d)
-        if p is not None:
-            st.pyplot(p)
-        # st.pyplot(aplast.trajectory.show(d_best))
+    with trajectory.container():
+        if results["animation"] is not None:
+            st.plotly_chart(results["animation"])
+        st.image(results["trajectory"])
 
 
 if __name__ == "__main__":
-    main()
+    with aplast.profiling.report() as report:
+        results = main()
+
+    with st.expander("Debug"):
+        st.dataframe(report.to_frame())
+        if results is not None:
+            st.caption("Background computations")
+            st.dataframe(results["report"].to_frame())
@@ -0,0 +1,181 @@
+"""Benchmarks of the physics and optimization hot paths
+
+python benchmarks/bench_aplast.py --size 100 --repeat 5
+
+Timings are saved in benchmarks/results/<version>.json and compared with the latest results of another version.
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import timeit
+import argparse
+import logging
+import platform
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import aplast
+from aplast.__version__ import __version__
+from aplast.memoize import LRUCache
+
+
+def get_benchmarks(size):
+    df = aplast.divers.estimate(aplast.divers.get_synthetic_data(size=size))
+    records = [df.loc[i].to_dict() for i in df.index]
+    diver = aplast.Diver(records[0])
+
+    def work_args(i):
+        return [
+            records[i]["depth_max"],
+            records[i]["mass_body"],
+            records[i]["mass_ballast"],
+            records[i]["volume_tissues"],
+            records[i]["volume_suit"],
+            records[i]["volume_lungs"],
+            records[i]["speed_descent"],
+            records[i]["speed_ascent"],
+            records[i]["drag_coefficient"],
+        ]
+
+    def time_get_volume_tissues():
+        aplast.diver.get_volume_tissues(
+            df.mass_body.values,
+            df.mass_ballast.values,
+            df.volume_suit.values,
+            df.volume_lungs.values,
+            df.speed_descent.values,
+            df.speed_ascent.values,
+            df.depth_gliding_descent.values,
+            df.depth_gliding_ascent.values,
+        )
+
+    def time_get_drag_coefficient():
+        aplast.diver.get_drag_coefficient(
+            df.volume_suit.values,
+            df.volume_lungs.values,
+            df.speed_descent.values,
+            df.speed_ascent.values,
+            df.depth_gliding_descent.values,
+            df.depth_gliding_ascent.values,
+        )
+
+    def time_get_total_work_scalar():
+        for i in range(size):
+            aplast.diver.get_total_work("", *work_args(i))
+
+    def time_get_total_work_batch():
+        aplast.diver.get_total_work_batch(
+            df.depth_max.values,
+            df.mass_body.values,
+            df.mass_ballast.values,
+            df.volume_tissues.values,
+            df.volume_suit.values,
+            df.volume_lungs.values,
+            df.speed_descent.values,
+            df.speed_ascent.values,
+            df.drag_coefficient.values,
+        )
+
+    def time_get_total_work_integral():
+        aplast.diver.get_total_work_integral(
+            df.depth_max.values,
+            df.mass_body.values,
+            df.mass_ballast.values,
+            df.volume_tissues.values,
+            df.volume_suit.values,
+            df.volume_lungs.values,
+            df.speed_descent.values,
+            df.speed_ascent.values,
+            df.drag_coefficient.values,
+        )
+
+    def time_diver_init():
+        for record in records:
+            aplast.Diver(record)
+
+    def time_diver_minimize():
+        diver.minimize(verbose=False)
+
+    def time_diver_minimize_jac():
+        diver.minimize(verbose=False, jac=True)
+
+    def time_diver_minimize_reduced():
+        diver.minimize(verbose=False, method="reduced")
+
+    def time_diver_get_total_work_variable():
+        diver.get_total_work(variable="mass_ballast")
+
+    def time_diver_get_total_work_grid():
+        diver.get_total_work(mass_ballast=np.linspace(0, 5, 100), thickness_suit=np.linspace(0, 5, 100))
+
+    def time_divers_minimize():
+        aplast.divers.minimize(df.copy())
+
+    def time_divers_minimize_batch():
+        aplast.divers.minimize(df.copy(), batch=True)
+
+    return {k: v for k, v in locals().items() if k.startswith("time_")}
+
+
+def get_previous_results(directory):
+    filenames = [f for f in glob.glob(os.path.join(directory, "*.json")) if not f.endswith(f"{__version__}.json")]
+    if not filenames:
+        return None
+
+    with open(max(filenames, key=os.path.getmtime)) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100, help="Size of the synthetic population")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timings of each benchmark")
+    parser.add_argument("--filter", default="", help="Only run the benchmarks containing this string")
+    parser.add_argument(
+        "--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results"), help="Results directory"
+    )
+    args = parser.parse_args()
+
+    # Measure the computations, not the cache nor the warnings of non physical configurations
+    aplast.Diver.cache = LRUCache(maxsize=0)
+    logging.getLogger("aplast").setLevel(logging.ERROR)
+
+    results = {}
+    for name, bench in get_benchmarks(args.size).items():
+        if args.filter not in name:
+            continue
+
+        timings = timeit.repeat(bench, number=1, repeat=args.repeat)
+        results[name] = {"mean": float(np.mean(timings)), "min": float(np.min(timings)), "repeat": args.repeat}
+
+    os.makedirs(args.output, exist_ok=True)
+    previous = get_previous_results(args.output)
+
+    print(f"{'benchmark':<40}{'min (ms)':>12}{'mean (ms)':>12}" + (f"{'vs ' + previous['version']:>14}" if previous else ""))
+    for name, r in results.items():
+        line = f"{name:<40}{1000 * r['min']:>12.3f}{1000 * r['mean']:>12.3f}"
+        if previous and name in previous["results"]:
+            line += f"{r['min'] / previous['results'][name]['min']:>13.2f}x"
+        print(line)
+
+    with open(os.path.join(args.output, f"{__version__}.json"), "w") as f:
+        json.dump(
+            {
+                "version": __version__,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "size": args.size,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
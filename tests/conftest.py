@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+import aplast
+
+
+@pytest.fixture
+def write_database():
+    """Write a synthetic database of submissions in filename (df if given), return its data"""
+
+    def write_database(filename, size=5, df=None):
+        if df is None:
+            df = aplast.divers.get_synthetic_data(size=size)
+            df["volume_lungs"] *= 1000
+            df["timestamp"] = pd.date_range("2022-10-01", periods=size, freq="D").astype(str)
+            for c in ["username", "name", "mass_suit", "model_suit", "rights"]:
+                df[c] = None
+        df[aplast.divers.database_columns].to_csv(filename, index=False)
+        return df
+
+    return write_database
+
+
+@pytest.fixture
+def get_diver():
+    """Factory of the reference diver, keyword arguments replace its data"""
+
+    def get_diver(**data):
+        return aplast.Diver(
+            data={
+                "surname": "No-one",
+                "depth_max": 85.0,
+                "time_descent": 100,
+                "time_ascent": 100,
+                "depth_gliding_descent": 28.0,
+                "depth_gliding_descent_error": 3.0,
+                "depth_gliding_ascent": 5.0,
+                "depth_gliding_ascent_error": 3.0,
+                "volume_lungs": 0.006,
+                "mass_body": 55.0,
+                "mass_ballast": 1.0,
+                "thickness_suit": 1.5,
+                **data,
+            }
+        )
+
+    return get_diver
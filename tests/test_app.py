@@ -1,27 +1,206 @@
+import logging
 import numpy as np
 
 import aplast
 import aplast.diver
 
 
-def test_get_volume_tissues():
-    d = aplast.Diver(
-        data={
-            "surname": "No-one",
-            "depth_max": 85.0,
-            "time_descent": 100,
-            "time_ascent": 100,
-            "depth_gliding_descent": 28.0,
-            "depth_gliding_descent_error": 3.0,
-            "depth_gliding_ascent": 5.0,
-            "depth_gliding_ascent_error": 3.0,
-            "volume_lungs": 0.006,
-            "mass_body": 55.0,
-            "mass_ballast": 1.0,
-            "thickness_suit": 1.5,
-        }
-    )
+def test_get_volume_tissues(get_diver):
+    d = get_diver()
     solution = d.minimize()
 
     for k, v in solution.items():
         print(k, v)
+
+
+def test_get_total_work_batch(get_diver):
+    d = get_diver()
+
+    mass_ballast = np.linspace(0, 5, 11)
+    works = aplast.diver.get_total_work_batch(
+        d.depth_max,
+        d.mass_body,
+        mass_ballast,
+        d.volume_tissues.n,
+        d.volume_suit,
+        d.volume_lungs,
+        d.speed_descent,
+        d.speed_ascent,
+        d.drag_coefficient.n,
+    )
+
+    for mb, work in zip(mass_ballast, works):
+        expected = aplast.diver.get_total_work(
+            d.surname,
+            d.depth_max,
+            d.mass_body,
+            mb,
+            d.volume_tissues.n,
+            d.volume_suit,
+            d.volume_lungs,
+            d.speed_descent,
+            d.speed_ascent,
+            d.drag_coefficient.n,
+        )
+        assert np.abs(work - expected) < 1e-6
+
+
+def test_get_total_work_integral(get_diver):
+    d = get_diver()
+    args = [d.depth_max, d.mass_body, np.linspace(0, 3, 4)[:, None], d.volume_tissues.n, np.array([0.001, 0.003])]
+    args += [d.volume_lungs, d.speed_descent, d.speed_ascent, d.drag_coefficient.n]
+
+    work = aplast.get_total_work_integral(*args)
+    assert work.shape == (4, 2)
+    assert np.allclose(work[:3], aplast.get_total_work_batch(*args)[:3], rtol=1e-5)
+
+    # With 3 kg and 1 mm the ascent is never gliding, which the closed form does not handle
+    assert work[3, 0] < aplast.get_total_work_batch(*args)[3, 0] - 1
+
+    # Speed profiles as functions of the depth
+    work_profile = aplast.get_total_work_integral(*args[:6], lambda depth: np.full(depth.shape, d.speed_descent), *args[7:])
+    assert np.allclose(work_profile, work)
+
+    faster = aplast.get_total_work_integral(*args[:6], lambda depth: d.speed_descent * (1 + depth / d.depth_max), *args[7:])
+    assert (faster > work).all()
+
+
+def test_minimize_jac(get_diver):
+    d = get_diver()
+
+    solution = d.minimize(verbose=False)
+    solution_jac = d.minimize(verbose=False, jac=True)
+
+    assert solution_jac["nfev"] < solution["nfev"]
+    for k in ["mass_ballast_best", "thickness_suit_best", "work_best"]:
+        assert np.abs(solution_jac[k] - solution[k]) < 1e-3 * (1 + np.abs(solution[k]))
+
+
+def test_minimize_reduced(get_diver):
+    d = get_diver()
+
+    solution = d.minimize(verbose=False)
+    solution_reduced = d.minimize(verbose=False, method="reduced")
+    for k in ["mass_ballast_best", "thickness_suit_best", "work_best"]:
+        assert np.abs(solution_reduced[k] - solution[k]) < 1e-3 * (1 + np.abs(solution[k]))
+
+    # Stationarity of the closed-form ballast
+    args = [d.depth_max, d.mass_body, d.volume_tissues.n, 0.003, d.volume_lungs, d.speed_descent, d.speed_ascent]
+    mass_ballast = aplast.diver.get_best_ballast(*args, d.drag_coefficient.n, bounds=(-np.inf, np.inf))
+    work = [
+        aplast.get_total_work_batch(*args[:2], mass_ballast + h, *args[2:], d.drag_coefficient.n) for h in [-1e-4, 0, 1e-4]
+    ]
+    assert work[1] < work[0] and work[1] < work[2]
+
+
+def test_minimize_warm_start(get_diver):
+    aplast.Diver.cache.clear()
+    warm_starts = aplast.diver.WarmStarts()
+
+    solution = warm_starts.minimize(get_diver(), verbose=False)
+    d = get_diver(depth_max=86.0)
+
+    solution_cold = d.minimize(verbose=False)
+    aplast.Diver.cache.clear()
+    solution_warm = warm_starts.minimize(d, verbose=False)
+
+    assert solution_warm["nfev"] < solution_cold["nfev"]
+    assert d.minimize(verbose=False, initial_guess=solution) == solution_warm
+
+    # Warm starts give the recommendations of the cold minimizations, which are cached apart
+    for record in aplast.divers.get_synthetic_data(size=20, seed=5).to_dict("records"):
+        warm_starts.minimize(aplast.Diver(record), verbose=False)
+        d = aplast.Diver(dict(record, depth_max=record["depth_max"] + 1))
+        solution_warm = warm_starts.minimize(d, verbose=False)
+        solution_cold = d.minimize(verbose=False)
+        assert solution_cold["mass_ballast_proposal"] is not solution_warm["mass_ballast_proposal"]
+
+        for k in ["mass_ballast_best", "thickness_suit_best", "work_best", "gain"]:
+            assert np.abs(solution_warm[k] - solution_cold[k]) < 1e-3 * (1 + np.abs(solution_cold[k]))
+        for k in ["mass_ballast_proposal", "thickness_suit_proposal"]:
+            assert np.abs(solution_warm[k].n - solution_cold[k].n) < 1e-3
+            assert np.abs(solution_warm[k].s - solution_cold[k].s) < 1e-3
+
+
+def test_diagnostics(get_diver):
+    d = get_diver()
+    args = [d.depth_max, np.array([30.0, 55.0]), 0.0, d.volume_tissues.n, 0.003, d.volume_lungs]
+    args += [d.speed_descent, d.speed_ascent, d.drag_coefficient.n]
+
+    aplast.diver.flag_counts.clear()
+    work, flags = aplast.get_total_work_batch(*args, diagnostics=True)
+    assert np.allclose(work, aplast.get_total_work_batch(*args))
+    assert flags["force_descent"].tolist() == [True, False]
+    assert flags["force_ascent"].tolist() == [True, False]
+    assert not flags["force_weight"].any()
+    assert aplast.diver.flag_counts == {"force_descent": 1, "force_ascent": 1}
+
+    work_scalar, flags_scalar = aplast.get_total_work(d.surname, args[0], 30.0, *args[2:], diagnostics=True)
+    assert np.isclose(work_scalar, work[0])
+    assert flags_scalar == {k: v[0] for k, v in flags.items()}
+    assert aplast.diver.flag_counts == {"force_descent": 2, "force_ascent": 2}
+
+    rate_limit = aplast.diver.RateLimitFilter(rate=2, period=60)
+    records = [logging.LogRecord("aplast", logging.WARNING, "", 0, "message", None, None) for _ in range(5)]
+    assert [rate_limit.filter(r) for r in records] == [True, True, False, False, False]
+    assert rate_limit.suppressed["message"] == 3
+
+
+def test_cache(get_diver):
+    aplast.Diver.cache.clear()
+
+    solution = get_diver().minimize(verbose=False)
+    d = get_diver()
+    assert aplast.Diver.cache.hits == 1
+    assert d.minimize(verbose=False) == solution
+    assert aplast.Diver.cache.hits == 2
+
+    get_key = aplast.memoize.get_key
+    assert get_key({"a": 1, "b": np.float64(2.5)}) == get_key({"b": 2.5, "a": 1.0})
+    assert get_key({"a": True}) != get_key({"a": 1})
+
+    cache = aplast.memoize.LRUCache(maxsize=2, ttl=60)
+    for k in range(3):
+        cache.set(k, k)
+    assert len(cache) == 2 and cache.get(0) is None and cache.get(2) == 2
+
+
+def test_minimize_montecarlo(get_diver):
+    d = get_diver()
+    bands = d.minimize_montecarlo(samples=500, seed=0)
+    solution = d.minimize(verbose=False)
+
+    assert list(bands.index) == [5, 50, 95]
+    assert (bands.diff().dropna() >= 0).all().all()
+    assert np.abs(bands.loc[50, "thickness_suit_best"] - solution["thickness_suit_best"]) < 0.2
+
+
+def test_get_total_work_grids(get_diver):
+    d = get_diver()
+    work = d.get_total_work(mass_ballast=np.linspace(0, 5, 6), thickness_suit=np.linspace(0, 5, 11))
+
+    assert work.unstack().shape == (6, 11)
+    expected = aplast.diver.get_total_work(
+        d.surname,
+        d.depth_max,
+        d.mass_body,
+        2.0,
+        d.volume_tissues.n,
+        2 * 1.5 / 1000,
+        d.volume_lungs,
+        d.speed_descent,
+        d.speed_ascent,
+        d.drag_coefficient.n,
+    )
+    assert np.abs(work.loc[(2.0, 1.5)] - expected) < 1e-6
+
+    for kwargs in [
+        dict(variable="thickness_suit"),
+        dict(variable="mass_ballast", depth_max=[80, 90]),
+        dict(volume_suit=[0.001, 0.002, 0.003], thickness_suit=[1, 2]),
+    ]:
+        try:
+            d.get_total_work(**kwargs)
+            assert False
+        except ValueError:
+            pass
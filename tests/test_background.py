@@ -0,0 +1,32 @@
+import threading
+
+import aplast
+import aplast.background
+
+
+def test_background():
+    background = aplast.background.Background()
+    release = threading.Event()
+
+    def compute(value):
+        release.wait(5)
+        return value * 2
+
+    background.submit("a", compute, 1)
+    pending = background.submit("b", compute, 2)
+    assert background.submit("b", compute, 2) is pending
+    assert list(background.futures) == ["b"]
+
+    # Nothing to show before the first result
+    assert background.result("b") is None
+    assert background.wait("b", timeout=0.05, poll=0.01) is None
+
+    release.set()
+    assert background.wait("b", poll=0.01, callback=lambda: None) == 4
+
+    # The last result is shown while the next key is computed
+    release.clear()
+    background.submit("c", compute, 3)
+    assert background.result("c") == 4
+    release.set()
+    assert background.wait("c") == 6 and background.last_key == "c"
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+import aplast
+
+
+def get_data():
+    df = pd.DataFrame(
+        {
+            "surname": ["No-one", "Someone", "Anyone"],
+            "depth_max": [85.0, 60.0, 110.0],
+            "time_descent": [100, 80, 120],
+            "time_ascent": [100, 75, 110],
+            "depth_gliding_descent": [28.0, 20.0, 30.0],
+            "depth_gliding_descent_error": [3.0, 3.0, 2.0],
+            "depth_gliding_ascent": [5.0, 8.0, 10.0],
+            "depth_gliding_ascent_error": [3.0, 3.0, 2.0],
+            "volume_lungs": [0.006, 0.005, 0.008],
+            "mass_body": [55.0, 70.0, 80.0],
+            "mass_ballast": [1.0, 2.0, 0.5],
+            "thickness_suit": [1.5, 3.0, 1.5],
+        }
+    )
+    df["volume_suit"] = 2 * df["thickness_suit"] / 1000.0
+    df["speed_descent"] = df["depth_max"] / df["time_descent"]
+    df["speed_ascent"] = df["depth_max"] / df["time_ascent"]
+    return df
+
+
+def test_minimize_workers():
+    serial = aplast.divers.minimize(get_data(), workers=1)
+    parallel = aplast.divers.minimize(get_data(), workers=2, chunksize=1)
+
+    assert list(serial.surname) == list(parallel.surname)
+    for c in ["mass_ballast_best", "thickness_suit_best", "work_best"]:
+        assert np.allclose(serial[c], parallel[c])
+
+
+def test_minimize_batch():
+    serial = aplast.divers.minimize(get_data())
+    batch = aplast.divers.minimize(get_data(), batch=True)
+
+    assert set(serial.columns) <= set(batch.columns)
+    for c in ["mass_ballast_best", "thickness_suit_best", "work_best"]:
+        assert np.allclose(serial[c], batch[c], atol=1e-3)
+
+
+def test_errors_backend():
+    df = aplast.divers.estimate(get_data())
+    volume_tissues_error, drag_coefficient_error = aplast.divers.get_errors(df, backend="numpy")
+    expected = aplast.divers.get_errors(df, backend="uncertainties")
+
+    assert np.allclose(volume_tissues_error, expected[0], rtol=1e-9)
+    assert np.allclose(drag_coefficient_error, expected[1], rtol=1e-9)
+
+    d = aplast.Diver(df.loc[0].to_dict())
+    assert np.abs(d.volume_tissues.s - volume_tissues_error[0]) < 1e-12
+
+    total_work_error = aplast.divers.get_work_error(df, backend="numpy")
+    assert np.allclose(total_work_error, aplast.divers.get_work_error(df, backend="uncertainties"), rtol=1e-9)
+    assert "total_work_error" in aplast.divers.estimate(get_data(), errors=True)
+
+
+def test_get_data(tmp_path, monkeypatch, write_database):
+    monkeypatch.setattr(aplast.Diver, "database_filename", str(tmp_path / "freediving_data.csv"))
+    expected = write_database(aplast.Diver.database_filename)
+
+    df = aplast.divers.get_data()
+    assert list(df.surname) == list(expected.surname) + ["Guillaume Néry"]
+    assert np.allclose(df.volume_lungs.iloc[:-1], expected.volume_lungs / 1000)
+
+    # Data is cached and copied
+    df["depth_max"] = 0
+    assert (aplast.divers.get_data().depth_max > 0).all()
+
+    d = aplast.divers.get_data(surname="Diver 3")
+    assert d.depth_max == expected.depth_max[3]
+
+
+def test_stream(tmp_path, write_database):
+    filename = str(tmp_path / "freediving_data.csv")
+    write_database(filename, size=25)
+
+    chunks = list(aplast.divers.stream(filename, chunksize=10))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+
+    df = pd.concat(chunks)
+    expected = aplast.divers.estimate(aplast.divers.get_synthetic_data(size=25))
+    assert np.allclose(df.total_work, expected.total_work)
+
+    output = str(tmp_path / "freediving_results.csv")
+    assert aplast.divers.stream_to_csv(output, filename, chunksize=10, optimize=True, batch=True) == 25
+    assert len(pd.read_csv(output)) == 25
+
+
+def test_diver_array():
+    divers = aplast.divers.DiverArray(get_data())
+    assert len(divers) == 3 and len(divers[1:]) == 2
+
+    view, d = divers[1], aplast.Diver(get_data().loc[1].to_dict())
+    assert view.surname == d.surname
+    assert np.abs(view.volume_tissues.n - d.volume_tissues.n) < 1e-12
+    assert np.abs(view.volume_tissues.s - d.volume_tissues.s) < 1e-12
+    assert np.abs(view.total_work - d.total_work.n) < 1e-6
+    assert view.minimize(verbose=False)["work_best"] == d.minimize(verbose=False)["work_best"]
+
+    solution = divers.minimize()
+    assert np.allclose(solution.thickness_suit_best, [v.minimize(verbose=False)["thickness_suit_best"] for v in divers])
@@ -0,0 +1,16 @@
+import os
+import sys
+import subprocess
+
+
+def get_loaded_modules(code):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    code = f"import sys; {code}; print(' '.join(m for m in ['matplotlib', 'scipy', 'pandas'] if m in sys.modules))"
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=root).stdout.split()
+
+
+def test_import_time():
+    # The physics does not need the plotting and the optimization libraries
+    assert get_loaded_modules("import aplast") == []
+    assert get_loaded_modules("import aplast; aplast.Diver; aplast.get_total_work_batch") == []
+    assert "matplotlib" in get_loaded_modules("import aplast; aplast.trajectory")
@@ -0,0 +1,26 @@
+import pandas as pd
+
+import aplast
+import aplast.incremental
+
+
+def test_update(tmp_path, monkeypatch, write_database):
+    monkeypatch.setattr(aplast.Diver, "database_filename", str(tmp_path / "freediving_data.csv"))
+    results_filename = str(tmp_path / "freediving_results.csv")
+    df = write_database(aplast.Diver.database_filename, size=4)
+
+    # The 4 divers and Guillaume Néry
+    assert len(aplast.incremental.update(results_filename, batch=True)) == 5
+    assert len(aplast.incremental.update(results_filename, batch=True)) == 0
+
+    # One new submission and one modified
+    new = df.iloc[[0]].assign(timestamp="2023-01-01", surname="New diver")
+    df.loc[1, "mass_body"] += 1
+    write_database(aplast.Diver.database_filename, df=pd.concat([df, new]))
+
+    processed = aplast.incremental.update(results_filename, batch=True)
+    assert sorted(processed.surname) == ["Diver 1", "New diver"]
+
+    results = aplast.incremental.read_results(results_filename)
+    assert len(results) == 6
+    assert (results.set_index("surname").loc["Diver 1", "mass_body"] == df.loc[1, "mass_body"]).all()
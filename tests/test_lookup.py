@@ -0,0 +1,22 @@
+import numpy as np
+
+import aplast
+from aplast.lookup import LookupTable, default_inputs
+
+
+def test_lookup_table(tmp_path):
+    table = LookupTable.build({"depth_max": [80, 90], "mass_body": [60, 70]})
+    table.save(tmp_path / "table.npz")
+    table = LookupTable.load(tmp_path / "table.npz")
+
+    data = dict(default_inputs, surname="No-one", depth_max=80, mass_body=70)
+    solution = table.query(data)
+    expected = aplast.Diver(data).minimize(verbose=False)
+
+    assert solution["source"] == "table"
+    for k in ["work", "work_best", "mass_ballast_best", "thickness_suit_best"]:
+        assert np.abs(solution[k] - expected[k]) < 1e-6
+
+    assert table.query(dict(data, depth_max=85))["source"] == "table"
+    assert table.query(dict(data, depth_max=100))["source"] == "optimizer"
+    assert table.query(dict(data, volume_lungs=0.007))["source"] == "optimizer"
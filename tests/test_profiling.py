@@ -0,0 +1,26 @@
+import aplast
+import aplast.profiling
+
+
+def test_report(get_diver):
+    # Instrumentation is off outside of a report
+    get_diver()
+    aplast.Diver.cache.clear()
+
+    with aplast.profiling.report() as report:
+        get_diver().minimize(verbose=False)
+        with aplast.profiling.report() as inner:
+            get_diver()
+
+    assert report.stats["Diver.__init__"][0] == 2
+    assert inner.stats["Diver.__init__"][0] == 1
+    assert report.stats["get_volume_tissues"][0] == 1
+
+    calls, total, nfev = report.stats["scipy.optimize.minimize (L-BFGS-B)"]
+    assert calls == 5 and total > 0 and nfev > 0
+    assert report.stats["get_total_work"][0] >= nfev
+
+    df = report.to_frame()
+    assert df.loc["Diver.__init__", "calls"] == 2
+    assert "scipy.optimize.minimize (L-BFGS-B)" in str(report)
+    assert not aplast.profiling.get_reports()
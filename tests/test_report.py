@@ -0,0 +1,41 @@
+import json
+
+import pandas as pd
+
+import aplast
+import aplast.report.tasks
+
+
+def test_main(tmp_path, write_database):
+    database_filename = str(tmp_path / "export.csv")
+    write_database(database_filename, size=4)
+
+    output = str(tmp_path / "results.csv")
+    timings = str(tmp_path / "timings.json")
+    assert aplast.report.tasks.main(["--input", database_filename, "--output", output, "--timings", timings]) == 0
+    assert aplast.Diver.database_filename == "freediving_data.csv"
+
+    # The 4 divers and Guillaume Néry
+    df = pd.read_csv(output)
+    assert len(df) == 5
+    assert {"mass_ballast_best", "thickness_suit_best", "gain", "gain_error"} <= set(df.columns)
+
+    with open(timings) as f:
+        summary = json.load(f)
+    assert summary["divers"] == 5
+    assert summary["stats"]["divers.minimize"]["calls"] == 1
+
+    # Chunk by chunk, without Guillaume Néry
+    output = str(tmp_path / "results_chunks.csv")
+    aplast.report.tasks.main(["--input", database_filename, "--output", output, "--chunksize", "3", "--batch"])
+    df_chunks = pd.read_csv(output)
+    assert len(df_chunks) == 4
+    assert (df_chunks["mass_ballast_best"] - df["mass_ballast_best"][:4]).abs().max() < 1e-3
+
+    # The batch solver has no method, gradient or workers options
+    for options in [["--method", "reduced"], ["--jac"], ["--workers", "2"]]:
+        try:
+            aplast.report.tasks.main(["--input", database_filename, "--output", output, "--batch"] + options)
+            assert False
+        except SystemExit as e:
+            assert e.code == 2
@@ -0,0 +1,34 @@
+import numpy as np
+
+import aplast
+import aplast.simulation
+
+
+def test_simulate(get_diver):
+    d = get_diver()
+    mass_ballast = np.array([0.0, 1.0, 3.0])
+    simulation = d.simulate(mass_ballast=mass_ballast)
+
+    depth, power = simulation["depth"], simulation["power"]
+    assert depth.shape == simulation["velocity"].shape == power.shape == (len(simulation["time"]), 3)
+    assert np.allclose(depth.max(axis=0), d.depth_max)
+    assert (depth[-1] == 0).all() and (power >= 0).all()
+
+    # Each configuration is simulated independently of the batch
+    single = d.simulate(mass_ballast=1.0)
+    assert np.allclose(single["depth"], depth[: len(single["time"]), 1])
+
+    # The work along the simulated dive is close to the closed form at constant speeds
+    work = power.sum(axis=0) * (simulation["time"][1] - simulation["time"][0])
+    expected = aplast.get_total_work_batch(
+        d.depth_max,
+        d.mass_body,
+        mass_ballast,
+        d.volume_tissues.n,
+        d.volume_suit,
+        d.volume_lungs,
+        d.speed_descent,
+        d.speed_ascent,
+        d.drag_coefficient.n,
+    )
+    assert np.allclose(work, expected, rtol=0.1)
@@ -0,0 +1,37 @@
+import aplast
+import aplast.trajectory
+
+
+def test_show(get_diver):
+    aplast.trajectory.figures_cache.clear()
+
+    figure = aplast.trajectory.show(get_diver())
+    assert aplast.trajectory.show(get_diver()) is figure
+    assert len(figure.axes) == 3
+
+    png = aplast.trajectory.show(get_diver(), format="png")
+    assert png.startswith(b"\x89PNG")
+    assert b"<svg" in aplast.trajectory.show(get_diver(), format="svg")
+
+    d = get_diver()
+    d.depth_max += 10
+    assert aplast.trajectory.show(d, format="png") != png
+    assert len(aplast.trajectory.figures_cache) == 4
+
+
+def test_show_dynamic(get_diver):
+    d = get_diver()
+    fig = aplast.trajectory.show_dynamic(d, frames=50)
+    assert aplast.trajectory.show_dynamic(d, frames=50) is fig
+
+    # Only the marker of the diver is animated, along the trajectory of the diver
+    assert len(fig.frames) == 50
+    assert all(frame.traces == (2,) for frame in fig.frames)
+    assert min(fig.data[0].y) == -d.depth_max
+    assert max(fig.data[0].x) == d.time_descent + d.time_ascent - 1
+
+    small = aplast.trajectory.show_dynamic(d, frames=200, max_bytes=15_000)
+    assert 2 < len(small.frames) < 200 and len(small.to_json()) <= 15_000
+
+    simulated = aplast.trajectory.show_dynamic(d, simulated=True, points=100)
+    assert len(simulated.data[0].x) <= 101